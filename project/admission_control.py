@@ -0,0 +1,234 @@
+import ipaddress
+import json
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+RATE_LIMIT_TOKENS_PER_SECOND = float(os.environ.get("RATE_LIMIT_TOKENS_PER_SECOND", 10))
+RATE_LIMIT_BURST = float(os.environ.get("RATE_LIMIT_BURST", 100))
+RATE_LIMIT_MAX_CLIENTS = int(os.environ.get("RATE_LIMIT_MAX_CLIENTS", 100000))
+RATE_LIMIT_TRUSTED_PROXIES = [
+    ipaddress.ip_network(network.strip())
+    for network in os.environ.get("RATE_LIMIT_TRUSTED_PROXIES", "").split(",")
+    if network.strip()
+]
+
+
+class RouteClass:
+    """
+    A group of routes sharing a token cost per request and a limit on how many of their requests run at once.
+    """
+
+    def __init__(self, name: str, cost: float, concurrency: Optional[int]):
+        self.name = name
+        self.cost = cost
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.admitted = 0
+        self.rate_limited = 0
+        self.overloaded = 0
+
+
+def _concurrency(name: str, default: int) -> int:
+    return int(os.environ.get(f"ADMISSION_CONCURRENCY_{name.upper()}", default))
+
+
+ROUTE_CLASSES: Dict[str, RouteClass] = {
+    route_class.name: route_class
+    for route_class in [
+        RouteClass("auth", cost=5, concurrency=_concurrency("auth", 8)),
+        RouteClass("generate", cost=20, concurrency=_concurrency("generate", 2)),
+        RouteClass("render", cost=10, concurrency=_concurrency("render", 4)),
+        RouteClass("batch", cost=50, concurrency=_concurrency("batch", 1)),
+        RouteClass("tile", cost=1, concurrency=_concurrency("tile", 32)),
+        RouteClass("simulate", cost=20, concurrency=_concurrency("simulate", 2)),
+        RouteClass("jobs", cost=10, concurrency=None),
+        RouteClass("bulk", cost=50, concurrency=_concurrency("bulk", 1)),
+        RouteClass("default", cost=1, concurrency=None),
+    ]
+}
+
+ROUTES: List[Tuple[str, re.Pattern, str]] = [
+    ("POST", re.compile(r"^/auth/(login|register)$"), "auth"),
+    ("POST", re.compile(r"^/map/generate$"), "generate"),
+    ("GET", re.compile(r"^/map/[^/]+/(render|delta)$"), "render"),
+    ("POST", re.compile(r"^/map/render/batch$"), "batch"),
+    ("GET", re.compile(r"^/map/[^/]+/tile/\d+/\d+/\d+$"), "tile"),
+    ("POST", re.compile(r"^/map/[^/]+/(npc/simulate|items/place)$"), "simulate"),
+    ("POST", re.compile(r"^/jobs/(generate|render)$"), "jobs"),
+    ("GET", re.compile(r"^/bulk/export$"), "bulk"),
+    ("POST", re.compile(r"^/bulk/import$"), "bulk"),
+]
+
+
+def classify(method: str, path: str) -> RouteClass:
+    """
+    Finds the route class of a request.
+
+    Args:
+        method (str): The HTTP method of the request.
+        path (str): The path of the request.
+
+    Returns:
+        RouteClass: The class of the first matching route, or the default class for all other routes.
+    """
+    for route_method, pattern, name in ROUTES:
+        if method == route_method and pattern.match(path):
+            return ROUTE_CLASSES[name]
+    return ROUTE_CLASSES["default"]
+
+
+class TokenBuckets:
+    """
+    One token bucket per client, refilled at RATE_LIMIT_TOKENS_PER_SECOND up to RATE_LIMIT_BURST tokens.
+
+    Only the RATE_LIMIT_MAX_CLIENTS most recently seen clients are tracked; a client that is dropped comes back
+    with a full bucket.
+    """
+
+    def __init__(self):
+        self.buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, client: str, cost: float) -> float:
+        """
+        Takes tokens from the bucket of a client if it holds enough of them.
+
+        Args:
+            client (str): The key of the client.
+            cost (float): The number of tokens the request costs.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the number of seconds until the bucket holds enough of them.
+        """
+        now = time.monotonic()
+        tokens, updated = self.buckets.pop(client, (RATE_LIMIT_BURST, now))
+        tokens = min(
+            RATE_LIMIT_BURST, tokens + (now - updated) * RATE_LIMIT_TOKENS_PER_SECOND
+        )
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (min(cost, RATE_LIMIT_BURST) - tokens) / RATE_LIMIT_TOKENS_PER_SECOND
+        self.buckets[client] = (tokens, now)
+        if len(self.buckets) > RATE_LIMIT_MAX_CLIENTS:
+            self.buckets.popitem(last=False)
+        return wait
+
+
+buckets = TokenBuckets()
+
+
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in RATE_LIMIT_TRUSTED_PROXIES)
+
+
+def _client_key(scope) -> str:
+    client = scope.get("client")
+    address = client[0] if client else "unknown"
+    if _is_trusted_proxy(address):
+        forwarded = [
+            hop.strip()
+            for name, value in scope.get("headers", [])
+            if name == b"x-forwarded-for"
+            for hop in value.decode("latin-1").split(",")
+            if hop.strip()
+        ]
+        # Walk back from the nearest hop: the first address not added by one of our proxies is the client.
+        for hop in reversed(forwarded):
+            address = hop
+            if not _is_trusted_proxy(hop):
+                break
+    return f"ip:{address}"
+
+
+async def _reject(send, status: int, retry_after: float, message: str) -> None:
+    body = json.dumps({"error": message}).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode("ascii")),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionControlMiddleware:
+    """
+    Rejects requests early instead of letting expensive routes pile up on a worker.
+
+    Every request takes its route class's cost from the token bucket of its client and is rejected with 429 when the
+    bucket runs dry. Clients are keyed by the peer address, or by the X-Forwarded-For address when the peer is one of
+    RATE_LIMIT_TRUSTED_PROXIES; values sent by the client itself are never trusted. Route classes with a
+    concurrency limit reject requests beyond it with 503. Both rejections carry a Retry-After header. Limits apply
+    per worker process.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route_class = classify(scope["method"], scope["path"])
+        if (
+            route_class.concurrency is not None
+            and route_class.in_flight >= route_class.concurrency
+        ):
+            route_class.overloaded += 1
+            await _reject(send, 503, 1, "Server is busy, please retry.")
+            return
+        wait = buckets.take(_client_key(scope), route_class.cost)
+        if wait > 0:
+            route_class.rate_limited += 1
+            await _reject(send, 429, wait, "Rate limit exceeded.")
+            return
+        route_class.admitted += 1
+        route_class.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_class.in_flight -= 1
+
+
+def render_metrics() -> str:
+    """
+    Renders the admission control counters in the Prometheus text exposition format.
+
+    Returns:
+        str: The metrics of every route class and the number of tracked clients.
+    """
+    lines = []
+    for metric, kind, attribute in [
+        ("admission_requests_admitted_total", "counter", "admitted"),
+        ("admission_requests_rate_limited_total", "counter", "rate_limited"),
+        ("admission_requests_overloaded_total", "counter", "overloaded"),
+        ("admission_requests_in_flight", "gauge", "in_flight"),
+    ]:
+        lines.append(f"# TYPE {metric} {kind}")
+        for route_class in ROUTE_CLASSES.values():
+            lines.append(
+                f'{metric}{{route_class="{route_class.name}"}} {getattr(route_class, attribute)}'
+            )
+    lines.append("# TYPE admission_concurrency_limit gauge")
+    for route_class in ROUTE_CLASSES.values():
+        if route_class.concurrency is not None:
+            lines.append(
+                f'admission_concurrency_limit{{route_class="{route_class.name}"}} {route_class.concurrency}'
+            )
+    lines.append("# TYPE admission_tracked_clients gauge")
+    lines.append(f"admission_tracked_clients {len(buckets.buckets)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import uuid
+from typing import AsyncIterator, List, Optional, Tuple
+
+import project.map_render
+import project.storage
+from pydantic import BaseModel
+
+MAX_BATCH_SIZE = 1000
+
+
+class RenderedMap(BaseModel):
+    """
+    The outcome of rendering the map of one game state in a batch: either the PNG image or the reason it could not be rendered.
+    """
+
+    gameStateId: str
+    mapImage: Optional[bytes] = None
+    error: Optional[str] = None
+
+
+async def batch_render_map(gameStateIds: List[str]) -> AsyncIterator[RenderedMap]:
+    """
+    Renders the maps of many game states at once.
+
+    All game states are fetched with a single query. Maps already rendered by any worker are yielded straight from
+    the shared map cache, and the rest are rendered in parallel across the render process pool and yielded in the
+    order they finish.
+
+    Args:
+        gameStateIds (List[str]): The unique identifiers of the game states whose maps are to be rendered.
+
+    Returns:
+        AsyncIterator[RenderedMap]: The outcome of rendering the map of every requested game state.
+    """
+    if len(gameStateIds) > MAX_BATCH_SIZE:
+        raise ValueError(f"A batch may render at most {MAX_BATCH_SIZE} maps.")
+    game_states = await project.storage.get_storage().game_states.find_many(
+        gameStateIds, include_maps=True
+    )
+    return _render_all(gameStateIds, game_states)
+
+
+async def _render_one(
+    game_state_id: str, project_map: project.storage.ProjectMapRecord
+) -> RenderedMap:
+    try:
+        png = await asyncio.wrap_future(project.map_render.submit_map_png(project_map))
+        return RenderedMap(gameStateId=game_state_id, mapImage=png)
+    except Exception as e:
+        return RenderedMap(gameStateId=game_state_id, error=str(e))
+
+
+async def _render_all(
+    gameStateIds: List[str], game_states: List[project.storage.GameStateRecord]
+) -> AsyncIterator[RenderedMap]:
+    found = {game_state.id: game_state for game_state in game_states}
+    renders = []
+    try:
+        for game_state_id in dict.fromkeys(gameStateIds):
+            game_state = found.get(game_state_id)
+            if not game_state or not game_state.Maps:
+                yield RenderedMap(
+                    gameStateId=game_state_id,
+                    error="GameState or Map not found for the provided ID.",
+                )
+                continue
+            png = project.map_render.cached_map_png(game_state.Maps[0])
+            if png is not None:
+                yield RenderedMap(gameStateId=game_state_id, mapImage=bytes(png))
+            else:
+                renders.append(
+                    asyncio.ensure_future(
+                        _render_one(game_state_id, game_state.Maps[0])
+                    )
+                )
+        for render in asyncio.as_completed(renders):
+            yield await render
+    finally:
+        for render in renders:
+            render.cancel()
+
+
+def encode_multipart(
+    results: AsyncIterator[RenderedMap],
+) -> Tuple[str, AsyncIterator[bytes]]:
+    """
+    Encodes rendered maps as a multipart/mixed stream, one part per game state.
+
+    Images are sent as image/png parts and failures as application/json parts with an "error" field; every part
+    names its game state in an X-Game-State-Id header.
+
+    Args:
+        results (AsyncIterator[RenderedMap]): The rendered maps, as produced by batch_render_map.
+
+    Returns:
+        Tuple[str, AsyncIterator[bytes]]: The media type of the stream, including its boundary, and the stream itself.
+    """
+    boundary = uuid.uuid4().hex
+
+    async def stream() -> AsyncIterator[bytes]:
+        async for result in results:
+            if result.mapImage is not None:
+                content_type, body = "image/png", result.mapImage
+            else:
+                content_type = "application/json"
+                body = json.dumps({"error": result.error}).encode("utf-8")
+            yield (
+                f"--{boundary}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"X-Game-State-Id: {result.gameStateId}\r\n\r\n"
+            ).encode("utf-8") + body + b"\r\n"
+        yield f"--{boundary}--\r\n".encode("utf-8")
+
+    return f"multipart/mixed; boundary={boundary}", stream()
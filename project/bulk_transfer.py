@@ -0,0 +1,367 @@
+import argparse
+import asyncio
+import base64
+import gzip
+import json
+import os
+import sys
+import time
+import zlib
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import numpy as np
+import project.grid_store
+import project.storage
+import project.wire_format
+from pydantic import BaseModel
+
+BULK_BATCH_SIZE = int(os.environ.get("BULK_BATCH_SIZE", 500))
+BULK_BATCH_CELLS = int(os.environ.get("BULK_BATCH_CELLS", 4 * 1024 * 1024))
+
+EXPORT_FORMAT = "maze-ndjson"
+EXPORT_VERSION = 1
+RELATION_FIELDS = {"Maps", "Items", "NPCs"}
+
+
+class ImportSummary(BaseModel):
+    """
+    Reports how many records of every table an import created and how fast it ran.
+    """
+
+    rows: Dict[str, int] = {}
+    totalRows: int = 0
+    seconds: float = 0
+    rowsPerSecond: float = 0
+
+
+def encode_grid_value(grid: np.ndarray) -> Dict[str, str]:
+    """
+    Encodes a grid of cell types compactly for NDJSON: the binary wire format of project.wire_format, zlib
+    compressed and base64 encoded, under a "$grid" key.
+
+    Args:
+        grid (np.ndarray): The (height, width) array of cell types.
+
+    Returns:
+        Dict[str, str]: The encoded grid.
+    """
+    return {
+        "$grid": base64.b64encode(
+            zlib.compress(project.wire_format.encode_grid(grid, {}), 6)
+        ).decode("ascii")
+    }
+
+
+def decode_grid_value(value: Dict[str, str]) -> np.ndarray:
+    """
+    Decodes a grid encoded with encode_grid_value.
+
+    Args:
+        value (Dict[str, str]): The encoded grid.
+
+    Returns:
+        np.ndarray: The (height, width) array of cell types.
+    """
+    grid, _ = project.wire_format.decode_grid(
+        zlib.decompress(base64.b64decode(value["$grid"]))
+    )
+    return grid
+
+
+def _is_encoded_grid(value: Any) -> bool:
+    return isinstance(value, dict) and set(value) == {"$grid"}
+
+
+def _as_grid(value: Any) -> Optional[np.ndarray]:
+    if not isinstance(value, list) or not value:
+        return None
+    try:
+        cells = np.asarray(value)
+    except ValueError:
+        return None
+    if (
+        cells.ndim != 2
+        or cells.dtype.kind not in "iu"
+        or cells.min() < 0
+        or cells.max() > 255
+    ):
+        return None
+    return cells.astype(np.uint8)
+
+
+def _encode_map_state(map_state: Any) -> Optional[Any]:
+    if isinstance(map_state, dict):
+        grid = _as_grid(map_state.get("cells"))
+        return None if grid is None else {**map_state, "cells": encode_grid_value(grid)}
+    grid = _as_grid(map_state)
+    return None if grid is None else encode_grid_value(grid)
+
+
+def _decode_map_state(map_state: Any) -> Optional[Any]:
+    if isinstance(map_state, dict) and _is_encoded_grid(map_state.get("cells")):
+        return {**map_state, "cells": decode_grid_value(map_state["cells"]).tolist()}
+    if _is_encoded_grid(map_state):
+        return decode_grid_value(map_state).tolist()
+    return None
+
+
+def _export_row(table: str, record: Any) -> Dict[str, Any]:
+    row = record.model_dump(mode="json", exclude=RELATION_FIELDS)
+    if table == "ProjectMap":
+        if project.grid_store.is_stored(record.cells):
+            grid = np.asarray(project.grid_store.open_grid(record.id))
+        else:
+            grid = _as_grid(record.cells)
+        if grid is not None:
+            row["cells"] = encode_grid_value(grid)
+    elif table == "GameState" and isinstance(row["data"], dict):
+        map_state = _encode_map_state(row["data"].get("mapState"))
+        if map_state is not None:
+            row["data"] = {**row["data"], "mapState": map_state}
+    return row
+
+
+async def export_records(tables: Optional[List[str]] = None) -> AsyncIterator[bytes]:
+    """
+    Exports tables as NDJSON, one record per line, without ever holding more than one batch in memory.
+
+    The first line is a header naming the format and its version; every other line is an object with the "table"
+    and the "row" of one record. Tables are written parents first (game states, maps, items, then NPCs), each read
+    in keyset order of its identifiers in batches of BULK_BATCH_SIZE. Map cells and the map state of saves, either a
+    list of rows or an object holding them under a "cells" key, are written as compact encoded grids (see
+    encode_grid_value). Users are not exported, so the users owning the
+    exported saves must exist wherever the export is imported.
+
+    Args:
+        tables (Optional[List[str]]): The tables to export, from BULK_TABLES; all of them when omitted.
+
+    Returns:
+        AsyncIterator[bytes]: The NDJSON stream, one chunk per batch.
+    """
+    tables = tables or project.storage.BULK_TABLES
+    unknown = set(tables) - set(project.storage.BULK_TABLES)
+    if unknown:
+        raise ValueError(f"Unknown tables: {', '.join(sorted(unknown))}.")
+    ordered = [table for table in project.storage.BULK_TABLES if table in tables]
+
+    async def stream() -> AsyncIterator[bytes]:
+        bulk = project.storage.get_storage().bulk
+        yield (
+            json.dumps(
+                {"format": EXPORT_FORMAT, "version": EXPORT_VERSION, "tables": ordered}
+            )
+            + "\n"
+        ).encode("utf-8")
+        for table in ordered:
+            after = None
+            while True:
+                records = await bulk.scan(table, after, BULK_BATCH_SIZE)
+                if not records:
+                    break
+                yield "".join(
+                    json.dumps({"table": table, "row": _export_row(table, record)})
+                    + "\n"
+                    for record in records
+                ).encode("utf-8")
+                after = records[-1].id
+
+    return stream()
+
+
+def _import_row(table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    if table == "ProjectMap" and _is_encoded_grid(row.get("cells")):
+        grid = decode_grid_value(row["cells"])
+        if project.grid_store.GRID_STORE_BACKEND == "mmap":
+            return {**row, "cells": project.grid_store.reference(grid.shape)}
+        return {**row, "cells": grid.tolist()}
+    if table == "GameState" and isinstance(row.get("data"), dict):
+        map_state = _decode_map_state(row["data"].get("mapState"))
+        if map_state is not None:
+            return {**row, "data": {**row["data"], "mapState": map_state}}
+    return row
+
+
+def _row_cells(table: str, row: Dict[str, Any]) -> int:
+    if table == "ProjectMap" and _is_encoded_grid(row.get("cells")):
+        header = zlib.decompressobj().decompress(
+            base64.b64decode(row["cells"]["$grid"]),
+            project.wire_format.GRID_HEADER.size,
+        )
+        height, width = project.wire_format.GRID_HEADER.unpack(header)[3:5]
+        return height * width
+    return 0
+
+
+class _Importer:
+    def __init__(self):
+        self.bulk = project.storage.get_storage().bulk
+        self.summary = ImportSummary()
+        self.table: Optional[str] = None
+        self.rows: List[Dict[str, Any]] = []
+        self.cells = 0
+
+    async def add(self, table: str, row: Dict[str, Any]) -> None:
+        if table not in project.storage.BULK_TABLES:
+            raise ValueError(f"Unknown table '{table}'.")
+        if table != self.table:
+            await self.flush()
+            self.table = table
+        self.cells += _row_cells(table, row)
+        self.rows.append(row)
+        if len(self.rows) >= BULK_BATCH_SIZE or self.cells >= BULK_BATCH_CELLS:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self.rows:
+            return
+        rows = [_import_row(self.table, row) for row in self.rows]
+        created = []
+        try:
+            if self.table == "ProjectMap":
+                for source, row in zip(self.rows, rows):
+                    if project.grid_store.is_stored(row["cells"]):
+                        project.grid_store.create(
+                            row["id"],
+                            decode_grid_value(source["cells"]),
+                            exclusive=True,
+                        )
+                        created.append(row["id"])
+            await self.bulk.insert_many(self.table, rows)
+        except BaseException:
+            for map_id in created:
+                project.grid_store.delete(map_id)
+            raise
+        self.summary.rows[self.table] = self.summary.rows.get(self.table, 0) + len(rows)
+        self.summary.totalRows += len(rows)
+        self.rows = []
+        self.cells = 0
+
+
+async def import_records(chunks: AsyncIterator[bytes]) -> ImportSummary:
+    """
+    Imports an NDJSON export into the storage backend.
+
+    The stream is read line by line and records are written with one create_many per batch of BULK_BATCH_SIZE
+    records of a table (fewer for batches of maps holding more than BULK_BATCH_CELLS cells), each in its own
+    transaction, so memory use stays constant however large the export is. Records keep their identifiers; an
+    import stops at the first batch that fails, for instance on a record that already exists, keeping the batches
+    written before it. With the mmap grid store, the grid files of a batch of maps are written before its rows and
+    removed again if the batch fails; maps that already have a grid file fail the batch without touching it.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The NDJSON stream, in chunks of any size.
+
+    Returns:
+        ImportSummary: Reports how many records of every table an import created and how fast it ran.
+    """
+    started = time.monotonic()
+    importer = _Importer()
+    header = None
+    pending = b""
+
+    async def handle(line: bytes) -> None:
+        nonlocal header
+        if not line.strip():
+            return
+        entry = json.loads(line)
+        if header is None:
+            if (
+                entry.get("format") != EXPORT_FORMAT
+                or entry.get("version") != EXPORT_VERSION
+            ):
+                raise ValueError("The stream is not a supported export.")
+            header = entry
+            return
+        await importer.add(entry["table"], entry["row"])
+
+    async for chunk in chunks:
+        pending += chunk
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            await handle(line)
+    await handle(pending)
+    await importer.flush()
+    summary = importer.summary
+    summary.seconds = round(time.monotonic() - started, 3)
+    summary.rowsPerSecond = round(summary.totalRows / max(summary.seconds, 1e-3), 1)
+    return summary
+
+
+def _open(path: str, mode: str):
+    if path == "-":
+        return sys.stdout.buffer if "w" in mode else sys.stdin.buffer
+    return gzip.open(path, mode) if path.endswith(".gz") else open(path, mode)
+
+
+async def _read_chunks(f) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await asyncio.to_thread(f.read, 1 << 20)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def _main(args: argparse.Namespace) -> None:
+    storage = project.storage.get_storage()
+    await storage.connect()
+    try:
+        if args.command == "export":
+            started = time.monotonic()
+            rows = 0
+            f = _open(args.output, "wb")
+            try:
+                async for chunk in await export_records(args.tables):
+                    rows += chunk.count(b"\n")
+                    await asyncio.to_thread(f.write, chunk)
+            finally:
+                if f is not sys.stdout.buffer:
+                    f.close()
+            seconds = time.monotonic() - started
+            print(
+                f"Exported {rows - 1} rows in {seconds:.1f}s "
+                f"({(rows - 1) / max(seconds, 1e-3):.0f} rows/s)",
+                file=sys.stderr,
+            )
+        else:
+            f = _open(args.input, "rb")
+            try:
+                summary = await import_records(_read_chunks(f))
+            finally:
+                if f is not sys.stdin.buffer:
+                    f.close()
+            print(summary.model_dump_json(indent=2))
+    finally:
+        await storage.disconnect()
+
+
+def main() -> None:
+    """
+    Command line entry point, run with `python -m project.bulk_transfer export|import`.
+    """
+    parser = argparse.ArgumentParser(
+        description="Export maps, items, NPCs and saves as NDJSON, or import such an export."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="write an NDJSON export")
+    export_parser.add_argument(
+        "--tables",
+        nargs="+",
+        choices=project.storage.BULK_TABLES,
+        help="the tables to export (all by default)",
+    )
+    export_parser.add_argument(
+        "--output",
+        default="-",
+        help="the file to write, gzip compressed if it ends in .gz (stdout by default)",
+    )
+    import_parser = commands.add_parser("import", help="read an NDJSON export")
+    import_parser.add_argument(
+        "input",
+        help="the file to read, gzip compressed if it ends in .gz, or - for stdin",
+    )
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import asyncio
+import gzip
+import os
+from typing import List, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", 1024))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", 5))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 4))
+COMPRESSION_THREAD_BYTES = 256 * 1024
+
+COMPRESSIBLE_MEDIA_TYPES = {
+    "application/json",
+    "application/octet-stream",
+    "application/msgpack",
+    "application/x-msgpack",
+}
+
+
+def _accepted_encodings(scope) -> List[str]:
+    for name, value in scope.get("headers", []):
+        if name == b"accept-encoding":
+            encodings = []
+            for part in value.decode("latin-1").split(","):
+                coding, *params = [item.strip() for item in part.split(";")]
+                if not any(
+                    param.replace(" ", "") in ("q=0", "q=0.0") for param in params
+                ):
+                    encodings.append(coding.lower())
+            return encodings
+    return []
+
+
+def choose_encoding(scope) -> Optional[str]:
+    """
+    Picks the content encoding for the response to a request: brotli when the client and server support it, gzip otherwise.
+
+    Args:
+        scope: The ASGI scope of the request.
+
+    Returns:
+        Optional[str]: "br", "gzip", or None when the client accepts neither.
+    """
+    encodings = _accepted_encodings(scope)
+    if brotli is not None and "br" in encodings:
+        return "br"
+    if "gzip" in encodings:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """
+    Compresses a response body with the given content encoding.
+
+    Args:
+        body (bytes): The response body.
+        encoding (str): "br" or "gzip".
+
+    Returns:
+        bytes: The compressed body.
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    Compresses JSON and binary grid responses with brotli or gzip, whichever the client accepts.
+
+    Only responses sent in a single body message are compressed, so streamed responses such as batch renders pass
+    through untouched and keep their latency. Bodies smaller than COMPRESSION_MIN_BYTES,
+    already encoded bodies and other media types such as PNG images are sent as they are. Large bodies are
+    compressed on a thread so the event loop keeps serving other requests.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+            pending, start = start, None
+            headers = pending.get("headers", [])
+            media_type = next(
+                (
+                    value.decode("latin-1").split(";")[0].strip().lower()
+                    for name, value in headers
+                    if name.lower() == b"content-type"
+                ),
+                "",
+            )
+            body = message.get("body", b"")
+            if (
+                message["type"] != "http.response.body"
+                or message.get("more_body", False)
+                or media_type not in COMPRESSIBLE_MEDIA_TYPES
+                or len(body) < COMPRESSION_MIN_BYTES
+                or any(name.lower() == b"content-encoding" for name, _ in headers)
+            ):
+                await send(pending)
+                await send(message)
+                return
+            if len(body) >= COMPRESSION_THREAD_BYTES:
+                body = await asyncio.to_thread(compress, body, encoding)
+            else:
+                body = compress(body, encoding)
+            headers = [
+                (name, value)
+                for name, value in headers
+                if name.lower() != b"content-length"
+            ]
+            headers += [
+                (b"content-encoding", encoding.encode("ascii")),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            await send({**pending, "headers": headers})
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,8 +1,8 @@
 import json
 from typing import Optional
 
-import prisma
-import prisma.models
+import project.item_placement
+import project.storage
 from pydantic import BaseModel
 
 
@@ -23,6 +23,7 @@ async def create_item(
     effects: str,
     placementConstraints: str,
     projectMapId: str,
+    place: bool = False,
 ) -> CreateItemOutput:
     """
     Create a new item with specified attributes in the database and returns confirmation details.
@@ -34,24 +35,51 @@ async def create_item(
         effects (str): The effects this item has when used or interacted with, stored as a JSON formatted string detailing effect types and magnitudes.
         placementConstraints (str): Constraints on where this item can be placed on the map, expressed in JSON format.
         projectMapId (str): The unique identifier of the map where the item is initially placed.
+        place (bool): Whether to place the item on a free cell of the map that satisfies its placement constraints.
 
     Returns:
         CreateItemOutput: Provides confirmation details of the newly created item, including a unique identifier for reference in future interactions or updates.
+
+    The placement constraints are checked and stored with the item. When place is set, the item is also placed on a
+    random free cell of the map that satisfies them, and the chosen cell is stored as "position" in its metadata;
+    many items are placed at once more cheaply with the items/place endpoint.
     """
     try:
-        metaData = json.dumps(
-            {
-                "effects": json.loads(effects),
-                "appearance": appearance,
-                "placementConstraints": json.loads(placementConstraints),
-            }
-        )
-        item = await prisma.models.Item.prisma().create(
+        constraints = project.item_placement.parse_constraints(placementConstraints)
+        storage = project.storage.get_storage()
+        metaData = {
+            "effects": json.loads(effects),
+            "appearance": appearance,
+            "placementConstraints": constraints,
+        }
+        if place:
+            project_map = await storage.maps.find(projectMapId, include_items=True)
+            if project_map is None:
+                return CreateItemOutput(
+                    itemId="",
+                    status="failed",
+                    message=f"ProjectMap with ID {projectMapId} does not exist.",
+                )
+            context = project.item_placement.PlacementContext(project_map)
+            x, y = context.place(
+                [constraints],
+                project.item_placement.occupied_mask(
+                    project_map.Items or [], context.grid.shape
+                ),
+            )[0]
+            if x < 0:
+                return CreateItemOutput(
+                    itemId="",
+                    status="failed",
+                    message="No free cell satisfies the placement constraints.",
+                )
+            metaData["position"] = {"x": int(x), "y": int(y)}
+        item = await storage.items.create(
             {
                 "name": name,
                 "description": description,
                 "projectMapId": projectMapId,
-                "metaData": metaData,
+                "metaData": json.dumps(metaData),
             }
         )
         return CreateItemOutput(
@@ -1,7 +1,6 @@
 from typing import Dict, Optional
 
-import prisma
-import prisma.models
+import project.storage
 from pydantic import BaseModel
 
 
@@ -31,16 +30,15 @@ async def create_npc(
     NPCResponse: The response of the NPC creation process containing either the details of the newly created NPC or a description of the error encountered.
     """
     try:
-        existing_project_map = await prisma.models.ProjectMap.prisma().find_unique(
-            where={"id": projectMapId}
-        )
+        storage = project.storage.get_storage()
+        existing_project_map = await storage.maps.find(projectMapId)
         if not existing_project_map:
             return NPCResponse(
                 success=False,
                 message=f"ProjectMap with ID {projectMapId} does not exist.",
             )
-        created_npc = await prisma.models.NPC.prisma().create(
-            data={
+        created_npc = await storage.npcs.create(
+            {
                 "name": name,
                 "description": description,
                 "attributes": attributes,
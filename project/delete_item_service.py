@@ -1,5 +1,4 @@
-import prisma
-import prisma.models
+import project.storage
 from pydantic import BaseModel
 
 
@@ -23,7 +22,7 @@ async def delete_item(itemId: str) -> DeleteItemResponse:
     DeleteItemResponse: This model provides feedback on the result of the delete operation, including any success or error messages.
     """
     try:
-        item = await prisma.models.Item.prisma().delete(where={"id": itemId})
+        item = await project.storage.get_storage().items.delete(itemId)
         if item:
             return DeleteItemResponse(
                 success=True, message=f"Item with ID {itemId} was successfully deleted."
@@ -1,5 +1,4 @@
-import prisma
-import prisma.models
+import project.storage
 from pydantic import BaseModel
 
 
@@ -29,7 +28,7 @@ async def delete_npc(npcId: str) -> DeleteNPCResponse:
         print(response)
         > {"message": "NPC with ID npc_uuid has been successfully deleted."}
     """
-    await prisma.models.NPC.prisma().delete(where={"id": npcId})
+    await project.storage.get_storage().npcs.delete(npcId)
     return DeleteNPCResponse(
         message=f"NPC with ID {npcId} has been successfully deleted."
     )
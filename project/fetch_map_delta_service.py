@@ -0,0 +1,154 @@
+import base64
+from typing import List, Tuple
+
+import numpy as np
+import project.map_cache
+import project.map_render
+import project.storage
+from pydantic import BaseModel
+
+DELTA_BLOCK_CELLS = 16
+MAX_DELTA_AREA_RATIO = 0.5
+
+
+class MapPatch(BaseModel):
+    """
+    A rectangle of changed cells, in cell coordinates, with the rendered cells as a base64 encoded PNG image.
+    """
+
+    x: int
+    y: int
+    width: int
+    height: int
+    image: str
+
+
+class MapDeltaResponse(BaseModel):
+    """
+    Response model containing the patches that turn the rendered map of the base game state into the rendered map of the requested game state.
+    """
+
+    gameStateId: str
+    baseGameStateId: str
+    cellPixels: int
+    cellStride: int = 1
+    fullRender: bool
+    patches: List[MapPatch]
+
+
+def changed_rectangles(
+    base: np.ndarray, current: np.ndarray
+) -> List[Tuple[int, int, int, int]]:
+    """
+    Finds rectangles covering every cell that differs between two grids of the same shape.
+
+    The grids are compared in blocks of DELTA_BLOCK_CELLS cells, runs of changed blocks along a row of blocks are
+    merged, and every merged run is shrunk to the changed cells it contains.
+
+    Args:
+        base (np.ndarray): The (height, width) array of cell types to compare against.
+        current (np.ndarray): The (height, width) array of cell types to compare.
+
+    Returns:
+        List[Tuple[int, int, int, int]]: The x, y, width and height of every rectangle, in cells.
+    """
+    changed = base != current
+    height, width = changed.shape
+    blocks_down = -(-height // DELTA_BLOCK_CELLS)
+    blocks_across = -(-width // DELTA_BLOCK_CELLS)
+    padded = np.zeros(
+        (blocks_down * DELTA_BLOCK_CELLS, blocks_across * DELTA_BLOCK_CELLS),
+        dtype=bool,
+    )
+    padded[:height, :width] = changed
+    dirty = padded.reshape(
+        blocks_down, DELTA_BLOCK_CELLS, blocks_across, DELTA_BLOCK_CELLS
+    ).any(axis=(1, 3))
+    run_starts = dirty.copy()
+    run_starts[:, 1:] &= ~dirty[:, :-1]
+    run_ends = dirty.copy()
+    run_ends[:, :-1] &= ~dirty[:, 1:]
+    rows, first_blocks = np.nonzero(run_starts)
+    _, last_blocks = np.nonzero(run_ends)
+    rectangles = []
+    for row, first, last in zip(rows, first_blocks, last_blocks):
+        top, left = row * DELTA_BLOCK_CELLS, first * DELTA_BLOCK_CELLS
+        run = changed[
+            top : top + DELTA_BLOCK_CELLS, left : (last + 1) * DELTA_BLOCK_CELLS
+        ]
+        changed_rows = np.flatnonzero(run.any(axis=1))
+        changed_columns = np.flatnonzero(run.any(axis=0))
+        rectangles.append(
+            (
+                int(left + changed_columns[0]),
+                int(top + changed_rows[0]),
+                int(changed_columns[-1] - changed_columns[0] + 1),
+                int(changed_rows[-1] - changed_rows[0] + 1),
+            )
+        )
+    return rectangles
+
+
+async def fetch_map_delta(gameStateId: str, baseGameStateId: str) -> MapDeltaResponse:
+    """
+    Fetches the changes between the maps of two game states as small rendered patches.
+
+    Args:
+        gameStateId (str): The unique identifier for the game state whose map the client wants to show.
+        baseGameStateId (str): The unique identifier for the game state whose map the client has already rendered.
+
+    Returns:
+        MapDeltaResponse: Response model containing the patches that turn the rendered map of the base game state into the rendered map of the requested game state.
+
+    Patches are rendered like fetch_map renders the whole map: maps wider or taller than MAX_RENDER_PIXELS cells
+    only have every cellStride-th row and column drawn, and each drawn cell spans cellPixels pixels. Patch
+    rectangles are aligned to the drawn cells, so a patch can be drawn over the previous image at
+    (x / cellStride * cellPixels, y / cellStride * cellPixels); changes to cells that are not drawn yield no patch.
+    When the maps differ in size or the changes cover most of the map, a single patch with the whole map is
+    returned and fullRender is set.
+    """
+    game_states = await project.storage.get_storage().game_states.find_many(
+        [gameStateId, baseGameStateId], include_maps=True
+    )
+    maps = {game_state.id: game_state.Maps for game_state in game_states}
+    if not maps.get(gameStateId) or not maps.get(baseGameStateId):
+        raise ValueError("GameState or Map not found for the provided IDs.")
+    current = project.map_cache.get_map_grid(maps[gameStateId][0])
+    base = project.map_cache.get_map_grid(maps[baseGameStateId][0])
+    stride = project.map_render.render_stride(current.shape)
+    cell_px = project.map_render.cell_pixels(current[::stride, ::stride].shape)
+    full_render = base.shape != current.shape
+    if not full_render:
+        rectangles = changed_rectangles(base, current)
+        changed_area = sum(width * height for _, _, width, height in rectangles)
+        full_render = changed_area > MAX_DELTA_AREA_RATIO * current.size
+    if full_render:
+        rectangles = [(0, 0, current.shape[1], current.shape[0])]
+    patches = []
+    for x, y, width, height in rectangles:
+        # Snap to the drawn cells: the first drawn column and row at or after the rectangle's start, up to the end.
+        left, right = -(-x // stride) * stride, -(-(x + width) // stride) * stride
+        top, bottom = -(-y // stride) * stride, -(-(y + height) // stride) * stride
+        if left >= right or top >= bottom:
+            continue
+        patches.append(
+            MapPatch(
+                x=left,
+                y=top,
+                width=min(right, current.shape[1]) - left,
+                height=min(bottom, current.shape[0]) - top,
+                image=base64.b64encode(
+                    project.map_render.render_png(
+                        current[top:bottom:stride, left:right:stride], cell_px
+                    )
+                ).decode("utf-8"),
+            )
+        )
+    return MapDeltaResponse(
+        gameStateId=gameStateId,
+        baseGameStateId=baseGameStateId,
+        cellPixels=cell_px,
+        cellStride=stride,
+        fullRender=full_render,
+        patches=patches,
+    )
@@ -0,0 +1,59 @@
+from typing import List
+
+import project.map_cache
+import project.storage
+from pydantic import BaseModel
+
+MAX_REGION_CELLS = 1024 * 1024
+
+
+class MapRegionResponse(BaseModel):
+    """
+    Response model containing a rectangular region of a map's cell grid, clipped to the bounds of the map.
+    """
+
+    projectMapId: str
+    x: int
+    y: int
+    width: int
+    height: int
+    cells: List[List[int]]
+
+
+async def fetch_map_region(
+    projectMapId: str, x: int, y: int, width: int, height: int
+) -> MapRegionResponse:
+    """
+    Fetches the cell types of a rectangular region of a map.
+
+    Args:
+        projectMapId (str): The unique identifier of the map to read from.
+        x (int): The column of the top-left cell of the region.
+        y (int): The row of the top-left cell of the region.
+        width (int): The number of columns in the region.
+        height (int): The number of rows in the region.
+
+    Returns:
+        MapRegionResponse: Response model containing a rectangular region of a map's cell grid, clipped to the bounds of the map.
+
+    Maps kept in the grid store are sliced directly out of their memory-mapped grid file, so only the rows
+    covered by the region are read from disk.
+    """
+    if width <= 0 or height <= 0 or width * height > MAX_REGION_CELLS:
+        raise ValueError(
+            f"Region must be non-empty and cover at most {MAX_REGION_CELLS} cells."
+        )
+    project_map = await project.storage.get_storage().maps.find(projectMapId)
+    if project_map is None:
+        raise ValueError("Map not found for the provided ID.")
+    right, bottom = max(x + width, 0), max(y + height, 0)
+    x, y = max(x, 0), max(y, 0)
+    region = project.map_cache.get_map_grid(project_map)[y:bottom, x:right]
+    return MapRegionResponse(
+        projectMapId=projectMapId,
+        x=x,
+        y=y,
+        width=region.shape[1],
+        height=region.shape[0],
+        cells=region.tolist(),
+    )
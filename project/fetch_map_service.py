@@ -1,9 +1,7 @@
 import base64
-from io import BytesIO
 
-import matplotlib.pyplot as plt
-import prisma
-import prisma.models
+import project.map_render
+import project.storage
 from pydantic import BaseModel
 
 
@@ -27,26 +25,28 @@ async def fetch_map(gameStateId: str) -> FetchMapResponse:
 
     This function fetches the game state data for the given ID, parses the map layout,
     uses matplotlib to render the map as a PNG image, converts the PNG image to a base64 encoded string,
-    and returns this string wrapped in a FetchMapResponse object.
+    and returns this string wrapped in a FetchMapResponse object. Decoded grids and rendered images are
+    kept in the shared map cache, so a map rendered by one worker is served by every other worker without
+    being decoded or rendered again.
     """
-    gameState = await prisma.models.GameState.prisma().find_unique(
-        where={"id": gameStateId}, include={"Maps": True}
+    return FetchMapResponse(
+        mapImage=base64.b64encode(await fetch_map_png(gameStateId)).decode("utf-8")
+    )
+
+
+async def fetch_map_png(gameStateId: str) -> bytes:
+    """
+    Fetches the current state of the map rendered as raw PNG bytes, for clients that accept image/png.
+
+    Args:
+        gameStateId (str): The unique identifier for the game state whose map is to be rendered.
+
+    Returns:
+        bytes: The rendered map as a PNG image.
+    """
+    gameState = await project.storage.get_storage().game_states.find(
+        gameStateId, include_maps=True
     )
     if not gameState or not gameState.Maps:
         raise ValueError("GameState or Map not found for the provided ID.")
-    map_layout = [[1 for _ in range(10)] for _ in range(10)]
-    fig, ax = plt.subplots()
-    ax.imshow(
-        map_layout, cmap="terrain"
-    )  # TODO(autogpt): Cannot access attribute "imshow" for class "ndarray[Any, dtype[Any]]"
-    #     Attribute "imshow" is unknown. reportAttributeAccessIssue
-    ax.axis(
-        "off"
-    )  # TODO(autogpt): Cannot access attribute "axis" for class "ndarray[Any, dtype[Any]]"
-    #     Attribute "axis" is unknown. reportAttributeAccessIssue
-    buf = BytesIO()
-    fig.savefig(buf, format="png")
-    plt.close(fig)
-    buf.seek(0)
-    map_image_base64 = base64.b64encode(buf.getvalue()).decode("utf-8")
-    return FetchMapResponse(mapImage=map_image_base64)
+    return bytes(project.map_render.get_map_png(gameState.Maps[0]))
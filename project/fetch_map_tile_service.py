@@ -0,0 +1,200 @@
+import hashlib
+import math
+from typing import Any, Tuple
+
+import numpy as np
+import project.map_cache
+import project.map_render
+import project.storage
+
+TILE_CELLS = 64
+TILE_PIXELS = 256
+
+_HASH_WEIGHTS = np.random.default_rng(0x6D617A65).integers(
+    0, 2**63, size=(2, TILE_CELLS, TILE_CELLS), dtype=np.uint64
+) | np.uint64(1)
+
+
+def max_zoom(shape: Tuple[int, int]) -> int:
+    """
+    Returns the zoom level at which one tile cell is one map cell; zoom level 0 fits the whole map into a single tile.
+
+    Args:
+        shape (Tuple[int, int]): The (height, width) of the map grid.
+
+    Returns:
+        int: The highest zoom level of the map.
+    """
+    return max(0, math.ceil(math.log2(max(max(shape), 1) / TILE_CELLS)))
+
+
+def tile_hashes(
+    project_map: Any, grid: np.ndarray, first_row: int, last_row: int
+) -> np.ndarray:
+    """
+    Returns a content hash for every full-resolution tile in a range of tile rows of a map, computing and publishing them to the shared cache on a miss.
+
+    The hashes are linear in the cells of each tile with random 64-bit weights, so a whole band of tiles is hashed
+    with one vectorized product. Each band is cached on its own, so a request only hashes the rows of tiles it
+    covers.
+
+    Args:
+        project_map (Any): A ProjectMap record.
+        grid (np.ndarray): The (height, width) array of cell types of the map.
+        first_row (int): The first row of tiles to hash.
+        last_row (int): The row of tiles after the last one to hash.
+
+    Returns:
+        np.ndarray: A (tile rows, tiles across, 2) array of uint64 hashes.
+    """
+    height, width = grid.shape
+    tiles_across = -(-width // TILE_CELLS)
+    last_row = min(last_row, -(-height // TILE_CELLS))
+    version = project.map_cache.map_version(project_map)
+    hashes = np.zeros((max(last_row - first_row, 0), tiles_across, 2), dtype=np.uint64)
+    band = None
+    for row in range(first_row, last_row):
+        key = f"tilehash:{version}:{row}"
+        cached = project.map_cache.get_array(key)
+        if cached is None:
+            if band is None:
+                band = np.zeros(
+                    (TILE_CELLS, tiles_across * TILE_CELLS), dtype=np.uint64
+                )
+            rows = grid[row * TILE_CELLS : (row + 1) * TILE_CELLS]
+            band[:] = 0
+            band[: rows.shape[0], :width] = rows
+            cached = project.map_cache.put_array(
+                key,
+                np.einsum(
+                    "atb,kab->tk",
+                    band.reshape(TILE_CELLS, tiles_across, TILE_CELLS),
+                    _HASH_WEIGHTS,
+                ),
+            )
+        hashes[row - first_row] = cached
+    return hashes
+
+
+def _tile_key(
+    project_map: Any, grid: np.ndarray, factor: int, x: int, y: int
+) -> Tuple[int, int, str]:
+    span = TILE_CELLS * factor
+    height = min(span, grid.shape[0] - y * span)
+    width = min(span, grid.shape[1] - x * span)
+    covered = tile_hashes(project_map, grid, y * factor, (y + 1) * factor)[
+        :, x * factor : (x + 1) * factor
+    ]
+    return (
+        height,
+        width,
+        hashlib.blake2b(covered.tobytes(), digest_size=16).hexdigest(),
+    )
+
+
+def tile_cells(
+    project_map: Any, grid: np.ndarray, zoom: int, z: int, x: int, y: int
+) -> np.ndarray:
+    """
+    Returns the downsampled cell types shown by a tile, building them from the tiles of the next zoom level.
+
+    Tiles at the highest zoom level are slices of the map. Every other tile is the priority reduction of the 2x2
+    block of tiles below it, so an overview tile costs four cached child tiles rather than a pass over every cell it
+    covers. Reduced tiles are kept in the shared map cache under a hash of the cells they cover.
+
+    Args:
+        project_map (Any): A ProjectMap record.
+        grid (np.ndarray): The (height, width) array of cell types of the map.
+        zoom (int): The highest zoom level of the map, as returned by max_zoom.
+        z (int): The zoom level of the tile.
+        x (int): The column of the tile at that zoom level.
+        y (int): The row of the tile at that zoom level.
+
+    Returns:
+        np.ndarray: Up to TILE_CELLS by TILE_CELLS cell types, fewer at the right and bottom edges of the map.
+    """
+    span = TILE_CELLS << (zoom - z)
+    if z == zoom:
+        return grid[y * span : (y + 1) * span, x * span : (x + 1) * span]
+    factor = 1 << (zoom - z)
+    height, width, digest = _tile_key(project_map, grid, factor, x, y)
+    key = f"tilecells:{factor}:{height}x{width}:{digest}"
+    cells = project.map_cache.get_array(key)
+    if cells is not None:
+        return cells
+    children = np.zeros((2 * TILE_CELLS, 2 * TILE_CELLS), dtype=np.uint8)
+    for dy in range(2):
+        for dx in range(2):
+            child_x, child_y = 2 * x + dx, 2 * y + dy
+            if (
+                child_x * span // 2 < grid.shape[1]
+                and child_y * span // 2 < grid.shape[0]
+            ):
+                child = tile_cells(project_map, grid, zoom, z + 1, child_x, child_y)
+                children[
+                    dy * TILE_CELLS : dy * TILE_CELLS + child.shape[0],
+                    dx * TILE_CELLS : dx * TILE_CELLS + child.shape[1],
+                ] = child
+    cells = project.map_render.reduce_grid(children, 2)[
+        : -(-height // factor), : -(-width // factor)
+    ]
+    return project.map_cache.put_array(key, cells)
+
+
+def render_tile(block: np.ndarray) -> bytes:
+    """
+    Renders up to TILE_CELLS by TILE_CELLS cells as a TILE_PIXELS square PNG, leaving the area past the edge of the map transparent.
+
+    Args:
+        block (np.ndarray): The cell types covered by the tile.
+
+    Returns:
+        bytes: The encoded PNG image.
+    """
+    rgba = np.zeros((TILE_PIXELS, TILE_PIXELS, 4), dtype=np.uint8)
+    pixels = project.map_render.colorize(block, TILE_PIXELS // TILE_CELLS)
+    rgba[: pixels.shape[0], : pixels.shape[1]] = pixels
+    return project.map_render.encode_png(rgba)
+
+
+async def fetch_map_tile(gameStateId: str, z: int, x: int, y: int) -> bytes:
+    """
+    Fetches one tile of the map of a game state, rendered as a fixed-size PNG image.
+
+    Args:
+        gameStateId (str): The unique identifier for the game state whose map is to be rendered.
+        z (int): The zoom level, from 0 (the whole map in one tile) up to max_zoom (one map cell per tile cell).
+        x (int): The column of the tile at that zoom level.
+        y (int): The row of the tile at that zoom level.
+
+    Returns:
+        bytes: The tile as a TILE_PIXELS square PNG image.
+
+    Tiles below the highest zoom level downsample the map with a priority reduction of cell types, built level by
+    level from the tiles below them (see tile_cells). Tiles are rendered lazily and kept in the shared map cache
+    under a hash of the cells they cover, so changing a map only re-renders the tiles whose cells changed.
+    """
+    gameState = await project.storage.get_storage().game_states.find(
+        gameStateId, include_maps=True
+    )
+    if not gameState or not gameState.Maps:
+        raise ValueError("GameState or Map not found for the provided ID.")
+    project_map = gameState.Maps[0]
+    grid = project.map_cache.get_map_grid(project_map)
+    zoom = max_zoom(grid.shape)
+    if not 0 <= z <= zoom:
+        raise ValueError(f"Zoom level must be between 0 and {zoom}.")
+    factor = 1 << (zoom - z)
+    span = TILE_CELLS * factor
+    if not (
+        0 <= x * span < max(grid.shape[1], 1) and 0 <= y * span < max(grid.shape[0], 1)
+    ):
+        raise ValueError(f"Tile {x}/{y} lies outside of the map at zoom level {z}.")
+    height, width, digest = _tile_key(project_map, grid, factor, x, y)
+    key = f"tile:{factor}:{height}x{width}:{digest}"
+    png = project.map_cache.get_bytes(key)
+    if png is None:
+        png = project.map_cache.put_bytes(
+            key, render_tile(tile_cells(project_map, grid, zoom, z, x, y))
+        )
+    return bytes(png)
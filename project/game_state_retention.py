@@ -0,0 +1,197 @@
+import argparse
+import asyncio
+import fcntl
+import gzip
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import project.storage
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+GAME_STATE_KEEP_LATEST = int(os.environ.get("GAME_STATE_KEEP_LATEST", 20))
+GAME_STATE_DAILY_CHECKPOINT_DAYS = int(
+    os.environ.get("GAME_STATE_DAILY_CHECKPOINT_DAYS", 30)
+)
+GAME_STATE_RETENTION_BATCH_SIZE = int(
+    os.environ.get("GAME_STATE_RETENTION_BATCH_SIZE", 500)
+)
+GAME_STATE_RETENTION_INTERVAL = float(
+    os.environ.get("GAME_STATE_RETENTION_INTERVAL", 0)
+)
+GAME_STATE_ARCHIVE_DIR = os.environ.get("GAME_STATE_ARCHIVE_DIR", "game_state_archive")
+
+
+class RetentionSummary(BaseModel):
+    """
+    Reports what a retention run did: how many users were scanned, how many saves were archived and deleted, and where the archives were written.
+    """
+
+    usersScanned: int = 0
+    gameStatesArchived: int = 0
+    archiveFiles: List[str] = []
+    skipped: bool = False
+
+
+def select_prunable(saves: List[Dict[str, Any]], now: datetime) -> List[str]:
+    """
+    Picks the saves of one user that are neither recent nor a checkpoint.
+
+    The GAME_STATE_KEEP_LATEST newest saves are kept. Of the older ones, the newest save of every day is kept for
+    the last GAME_STATE_DAILY_CHECKPOINT_DAYS days, and the newest save of every ISO week before that. Saves that
+    still have maps attached are always kept, since the maps reference them.
+
+    Args:
+        saves (List[Dict[str, Any]]): The saves of the user, newest first, each with "id", "updatedAt" and "hasMaps".
+        now (datetime): The time the retention run started, in UTC.
+
+    Returns:
+        List[str]: The identifiers of the saves to archive and delete.
+    """
+    daily_since = now - timedelta(days=GAME_STATE_DAILY_CHECKPOINT_DAYS)
+    checkpoints = set()
+    prunable = []
+    for save in saves[GAME_STATE_KEEP_LATEST:]:
+        updated_at = datetime.fromisoformat(save["updatedAt"])
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        if updated_at >= daily_since:
+            bucket = ("day", updated_at.date())
+        else:
+            bucket = ("week", updated_at.isocalendar()[:2])
+        if bucket not in checkpoints:
+            checkpoints.add(bucket)
+        elif not save["hasMaps"]:
+            prunable.append(save["id"])
+    return prunable
+
+
+def _write_archive(game_states: List[project.storage.GameStateRecord]) -> str:
+    os.makedirs(GAME_STATE_ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(
+        GAME_STATE_ARCHIVE_DIR,
+        "game-states-{}-{}.ndjson.gz".format(
+            datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S"), uuid.uuid4().hex[:8]
+        ),
+    )
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for game_state in game_states:
+            f.write(
+                json.dumps(
+                    {
+                        "id": game_state.id,
+                        "userId": game_state.userId,
+                        "data": game_state.data,
+                        "createdAt": game_state.createdAt.isoformat(),
+                        "updatedAt": game_state.updatedAt.isoformat(),
+                    }
+                )
+            )
+            f.write("\n")
+        f.flush()
+        os.fsync(f.fileno())
+    return path
+
+
+async def compact_game_states(dry_run: bool = False) -> RetentionSummary:
+    """
+    Archives and deletes old saves of every user, keeping the latest saves and thinned checkpoints.
+
+    Users are scanned in keyset order and their saves are processed in batches of GAME_STATE_RETENTION_BATCH_SIZE.
+    Every batch is written to a gzip compressed NDJSON file in GAME_STATE_ARCHIVE_DIR and synced to disk before it
+    is deleted with a single short statement, so the table is never locked for long. Only one run per host is
+    active at a time; concurrent runs from other workers return with skipped set.
+
+    Args:
+        dry_run (bool): Whether to only count the saves that would be archived, without writing or deleting anything.
+
+    Returns:
+        RetentionSummary: Reports what a retention run did: how many users were scanned, how many saves were archived and deleted, and where the archives were written.
+    """
+    summary = RetentionSummary()
+    os.makedirs(GAME_STATE_ARCHIVE_DIR, exist_ok=True)
+    with open(os.path.join(GAME_STATE_ARCHIVE_DIR, ".lock"), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            summary.skipped = True
+            return summary
+        now = datetime.now(timezone.utc)
+        game_state_repository = project.storage.get_storage().game_states
+        last_user_id: Optional[str] = None
+        while True:
+            user_ids = await game_state_repository.list_user_ids(
+                last_user_id, GAME_STATE_RETENTION_BATCH_SIZE
+            )
+            if not user_ids:
+                break
+            for user_id in user_ids:
+                saves = await game_state_repository.list_retention_candidates(user_id)
+                prunable = select_prunable(saves, now)
+                summary.usersScanned += 1
+                for start in range(0, len(prunable), GAME_STATE_RETENTION_BATCH_SIZE):
+                    batch = prunable[start : start + GAME_STATE_RETENTION_BATCH_SIZE]
+                    summary.gameStatesArchived += len(batch)
+                    if dry_run:
+                        continue
+                    game_states = await game_state_repository.find_many(batch)
+                    summary.archiveFiles.append(
+                        await asyncio.to_thread(_write_archive, game_states)
+                    )
+                    await game_state_repository.delete_many(
+                        [game_state.id for game_state in game_states]
+                    )
+            last_user_id = user_ids[-1]
+    return summary
+
+
+async def run_periodically() -> None:
+    """
+    Runs compact_game_states every GAME_STATE_RETENTION_INTERVAL seconds until cancelled.
+    """
+    while True:
+        await asyncio.sleep(GAME_STATE_RETENTION_INTERVAL)
+        try:
+            summary = await compact_game_states()
+            logger.info(
+                "Archived %d game states of %d users",
+                summary.gameStatesArchived,
+                summary.usersScanned,
+            )
+        except Exception:
+            logger.exception("Error compacting game states")
+
+
+async def _main(dry_run: bool) -> None:
+    storage = project.storage.get_storage()
+    await storage.connect()
+    try:
+        summary = await compact_game_states(dry_run)
+    finally:
+        await storage.disconnect()
+    print(summary.model_dump_json(indent=2))
+
+
+def main() -> None:
+    """
+    Command line entry point, run with `python -m project.game_state_retention`.
+    """
+    parser = argparse.ArgumentParser(
+        description="Archive and delete old game states, keeping the latest saves and thinned checkpoints."
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only report how many game states would be archived",
+    )
+    args = parser.parse_args()
+    asyncio.run(_main(args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
-from typing import Dict, List
+import asyncio
+from typing import Dict, List, Optional
 
-import prisma
-import prisma.models
+import project.grid_store
+import project.map_render
+import project.map_validation
+import project.storage
 from pydantic import BaseModel
 
 
@@ -11,12 +14,17 @@ class GenerateMapResponse(BaseModel):
     """
 
     map_id: str
-    map_layout: List[List[int]]
+    map_layout: Optional[List[List[int]]] = None
     rooms: List[Dict]
+    validation: project.map_validation.MapValidationReport
+
+
+def _blank_layout(width: int, height: int) -> List[List[int]]:
+    return [[0 for _ in range(width)] for _ in range(height)]
 
 
 async def generate_map(
-    map_size: str, room_sizes: List[str], corridor_width: int
+    gameStateId: str, map_size: str, room_sizes: List[str], corridor_width: int
 ) -> GenerateMapResponse:
     """
     Generates a new map based on provided configurations or defaults.
@@ -25,6 +33,7 @@ async def generate_map(
     then saves this map in the database under a specific GameState, and returns a GenerateMapResponse model with the map's details.
 
     Args:
+        gameStateId (str): The unique identifier of the game state the map belongs to.
         map_size (str): Defines the size of the map grid, e.g., "10x10".
         room_sizes (List[str]): Specifies the sizes of rooms to generate within the map, e.g., ["5x5", "3x4"].
         corridor_width (int): Width of the corridors connecting rooms, typically 1 or 2 cells.
@@ -34,18 +43,44 @@ async def generate_map(
 
     The map is initialized with all cells set to 0 indicating unknown areas. The rooms and corridors are then carved out in the map,
     with room cells set to 1 (floor), and corridor cells set to 2. Walls are automatically generated around rooms and corridors with cell value set to 3.
+    When GRID_STORE_BACKEND is "mmap", the grid is created directly in the memory-mapped grid store and the map row only keeps a reference
+    to it; the layout is then never built in memory nor returned, and is read back with the map region endpoint instead.
+    The generated map is validated for playability in the render process pool, off the event loop, and its walkable region labels
+    are cached for later validations.
     """
     dimensions = map_size.split("x")
     map_width, map_height = (int(dimensions[0]), int(dimensions[1]))
-    map_layout = [[0 for _ in range(map_width)] for _ in range(map_height)]
     rooms_details = []
-    new_map = await prisma.models.ProjectMap.prisma().create(
-        data={
+    storage = project.storage.get_storage()
+    if await storage.game_states.find(gameStateId) is None:
+        raise ValueError("GameState not found for the provided ID.")
+    use_grid_store = project.grid_store.GRID_STORE_BACKEND == "mmap"
+    map_layout = (
+        None
+        if use_grid_store
+        else await asyncio.to_thread(_blank_layout, map_width, map_height)
+    )
+    new_map = await storage.maps.create(
+        {
+            "gameStateId": gameStateId,
             "name": "Generated Map",
             "description": "A procedurally generated map",
-            "cells": map_layout,
+            "cells": (
+                project.grid_store.reference((map_height, map_width))
+                if use_grid_store
+                else map_layout
+            ),
         }
     )
+    if use_grid_store:
+        project.grid_store.create(new_map.id, shape=(map_height, map_width))
     return GenerateMapResponse(
-        map_id=new_map.id, map_layout=map_layout, rooms=rooms_details
+        map_id=new_map.id,
+        map_layout=map_layout,
+        rooms=rooms_details,
+        validation=await asyncio.wrap_future(
+            project.map_render.get_render_pool().submit(
+                project.map_validation.validate_map, new_map
+            )
+        ),
     )
@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+GRID_STORE_BACKEND = os.environ.get("GRID_STORE_BACKEND", "json")
+GRID_STORE_DIR = os.environ.get("GRID_STORE_DIR", "grid_store")
+GRID_STORE_FSYNC_INTERVAL = float(os.environ.get("GRID_STORE_FSYNC_INTERVAL", 5.0))
+
+_MAGIC = b"MZGS"
+_HEADER_DTYPE = np.dtype(
+    {
+        "names": ["magic", "height", "width", "generation"],
+        "formats": ["S4", "<u4", "<u4", "<u8"],
+        "offsets": [0, 4, 8, 16],
+        "itemsize": 64,
+    }
+)
+
+_open_grids: Dict[str, Tuple[np.memmap, np.memmap]] = {}
+_dirty: Dict[str, np.memmap] = {}
+
+
+def _grid_path(map_id: str) -> str:
+    return os.path.join(GRID_STORE_DIR, f"{map_id}.grid")
+
+
+def _open(map_id: str) -> Tuple[np.memmap, np.memmap]:
+    if map_id not in _open_grids:
+        path = _grid_path(map_id)
+        header = np.memmap(path, dtype=_HEADER_DTYPE, mode="r+", shape=(1,))
+        if header["magic"][0] != _MAGIC:
+            raise ValueError(f"{path} is not a grid store file.")
+        shape = (int(header["height"][0]), int(header["width"][0]))
+        cells = np.memmap(
+            path, dtype=np.uint8, mode="r+", offset=_HEADER_DTYPE.itemsize, shape=shape
+        )
+        _open_grids[map_id] = (header, cells)
+    return _open_grids[map_id]
+
+
+def is_stored(cells: Any) -> bool:
+    """
+    Checks whether the `ProjectMap.cells` value of a map is a reference into the grid store rather than the grid itself.
+
+    Args:
+        cells (Any): The cells column of a ProjectMap record.
+
+    Returns:
+        bool: True if the grid lives in the grid store.
+    """
+    return isinstance(cells, dict) and cells.get("store") == "mmap"
+
+
+def reference(shape: Tuple[int, int]) -> Dict[str, Any]:
+    """
+    Builds the value stored in `ProjectMap.cells` for a map whose grid lives in the grid store.
+
+    Args:
+        shape (Tuple[int, int]): The (height, width) of the grid.
+
+    Returns:
+        Dict[str, Any]: The reference to the grid file.
+    """
+    return {"store": "mmap", "height": shape[0], "width": shape[1]}
+
+
+def create(
+    map_id: str,
+    grid: Optional[np.ndarray] = None,
+    shape: Optional[Tuple[int, int]] = None,
+    exclusive: bool = False,
+) -> Dict[str, Any]:
+    """
+    Creates the grid file of a map, filled either from an existing grid or with unknown cells.
+
+    Args:
+        map_id (str): The identifier of the map the grid belongs to.
+        grid (Optional[np.ndarray]): The initial cell types; omitted to create an empty grid of the given shape.
+        shape (Optional[Tuple[int, int]]): The (height, width) of the grid when no initial grid is given.
+        exclusive (bool): Whether to raise FileExistsError instead of replacing a grid file the map already has.
+
+    Returns:
+        Dict[str, Any]: The reference to store in `ProjectMap.cells` in place of the grid.
+    """
+    height, width = grid.shape if grid is not None else shape
+    os.makedirs(GRID_STORE_DIR, exist_ok=True)
+    path = _grid_path(map_id)
+    with open(path, "xb" if exclusive else "wb") as f:
+        header = np.zeros(1, dtype=_HEADER_DTYPE)
+        header["magic"] = _MAGIC
+        header["height"] = height
+        header["width"] = width
+        f.write(header.tobytes())
+        f.truncate(_HEADER_DTYPE.itemsize + height * width)
+    _open_grids.pop(map_id, None)
+    if grid is not None:
+        _, cells = _open(map_id)
+        cells[:] = grid
+        cells.flush()
+    return reference((height, width))
+
+
+def delete(map_id: str) -> None:
+    """
+    Removes the grid file of a map, dropping any unflushed writes to it.
+
+    Args:
+        map_id (str): The identifier of the map.
+    """
+    _open_grids.pop(map_id, None)
+    _dirty.pop(map_id, None)
+    try:
+        os.remove(_grid_path(map_id))
+    except FileNotFoundError:
+        pass
+
+
+def open_grid(map_id: str) -> np.ndarray:
+    """
+    Maps the grid of a map without reading it; pages are loaded only as cells are accessed.
+
+    Args:
+        map_id (str): The identifier of the map.
+
+    Returns:
+        np.ndarray: A read-only (height, width) view of the cell types backed by the grid file.
+    """
+    _, cells = _open(map_id)
+    view = cells.view(np.ndarray)
+    view.setflags(write=False)
+    return view
+
+
+def generation(map_id: str) -> int:
+    """
+    Returns the write counter of a map's grid, which increases with every region write.
+
+    Args:
+        map_id (str): The identifier of the map.
+
+    Returns:
+        int: The number of writes made to the grid so far.
+    """
+    header, _ = _open(map_id)
+    return int(header["generation"][0])
+
+
+def write_region(map_id: str, x: int, y: int, block: np.ndarray) -> None:
+    """
+    Overwrites a rectangular region of a map's grid in place.
+
+    The change is visible to every process mapping the grid immediately. It is synced to disk by the next flush(),
+    which flush_periodically() runs every GRID_STORE_FSYNC_INTERVAL seconds.
+
+    Args:
+        map_id (str): The identifier of the map.
+        x (int): The column of the top-left cell of the region.
+        y (int): The row of the top-left cell of the region.
+        block (np.ndarray): The cell types to write, of shape (height, width).
+    """
+    header, cells = _open(map_id)
+    height, width = block.shape
+    if x < 0 or y < 0 or y + height > cells.shape[0] or x + width > cells.shape[1]:
+        raise ValueError("Region lies outside of the map.")
+    cells[y : y + height, x : x + width] = block
+    header["generation"] += 1
+    _dirty[map_id] = cells
+
+
+def flush() -> None:
+    """
+    Syncs every grid written since the last flush to disk.
+    """
+    global _dirty
+    dirty, _dirty = _dirty, {}
+    for map_id, cells in dirty.items():
+        _open_grids[map_id][0].flush()
+        cells.flush()
+
+
+async def flush_periodically() -> None:
+    """
+    Flushes written grids every GRID_STORE_FSYNC_INTERVAL seconds, syncing them in a thread so the event loop keeps
+    serving requests while pages are written back.
+    """
+    while True:
+        await asyncio.sleep(GRID_STORE_FSYNC_INTERVAL)
+        try:
+            await asyncio.to_thread(flush)
+        except Exception:
+            logger.exception("Error flushing the grid store")
@@ -0,0 +1,243 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import project.map_cache
+import project.map_grid
+import project.map_validation
+
+
+def _cell_type(name: str) -> int:
+    try:
+        return project.map_grid.CELL_TYPE_NAMES.index(name)
+    except ValueError:
+        raise ValueError(f"Unknown cell type '{name}'.") from None
+
+
+def parse_constraints(placementConstraints: Any) -> Dict[str, Any]:
+    """
+    Parses and checks the placement constraints of an item.
+
+    Constraints are an object with any of the following keys, all of which must hold for a cell to be valid:
+    "onCellTypes" and "notOnCellTypes" (lists of cell type names), "minDistanceFrom" and "maxDistanceFrom" (objects
+    mapping cell type names to a distance in cells, measured along the grid) and "minRoomSize" (the number of floor
+    cells in the room the item is placed in). Other keys are kept as they are and ignored by placement.
+
+    Args:
+        placementConstraints (Any): The constraints, as an object or a JSON string of one; None or empty for no constraints.
+
+    Returns:
+        Dict[str, Any]: The parsed constraints.
+    """
+    if isinstance(placementConstraints, str):
+        placementConstraints = json.loads(placementConstraints)
+    if not placementConstraints:
+        return {}
+    if not isinstance(placementConstraints, dict):
+        raise ValueError("Placement constraints must be a JSON object.")
+    for key in ("onCellTypes", "notOnCellTypes"):
+        for name in placementConstraints.get(key, []):
+            _cell_type(name)
+    for key in ("minDistanceFrom", "maxDistanceFrom"):
+        for name, distance in placementConstraints.get(key, {}).items():
+            _cell_type(name)
+            int(distance)
+    int(placementConstraints.get("minRoomSize", 0))
+    return placementConstraints
+
+
+def distance_transform(sources: np.ndarray) -> np.ndarray:
+    """
+    Computes the Manhattan distance from every cell to the nearest source cell.
+
+    The transform is separable: two sweeps along the rows followed by two sweeps along the columns, each step
+    updating a whole column or row at once.
+
+    Args:
+        sources (np.ndarray): A (height, width) boolean array of the source cells.
+
+    Returns:
+        np.ndarray: A (height, width) int32 array of distances, height + width where there is no source.
+    """
+    height, width = sources.shape
+    distances = np.where(sources, 0, height + width).astype(np.int32)
+    columns = distances.T
+    for x in range(1, width):
+        np.minimum(columns[x], columns[x - 1] + 1, out=columns[x])
+    for x in range(width - 2, -1, -1):
+        np.minimum(columns[x], columns[x + 1] + 1, out=columns[x])
+    for y in range(1, height):
+        np.minimum(distances[y], distances[y - 1] + 1, out=distances[y])
+    for y in range(height - 2, -1, -1):
+        np.minimum(distances[y], distances[y + 1] + 1, out=distances[y])
+    return distances
+
+
+def _group_by_constraints(constraint_sets: List[Dict[str, Any]]) -> List[List[int]]:
+    groups: Dict[str, List[int]] = {}
+    for index, constraints in enumerate(constraint_sets):
+        groups.setdefault(json.dumps(constraints, sort_keys=True), []).append(index)
+    return list(groups.values())
+
+
+class PlacementContext:
+    """
+    The grid of a map together with the per-cell features placement constraints are evaluated against.
+
+    Distance fields and room sizes are computed on first use and kept in the shared map cache, so they are computed
+    once per map version and shared by all workers.
+    """
+
+    def __init__(self, project_map: Any):
+        self.project_map = project_map
+        self.version = project.map_cache.map_version(project_map)
+        self.grid = project.map_cache.get_map_grid(project_map)
+
+    def distance_from(self, cell_type: int) -> np.ndarray:
+        key = f"distance:{cell_type}:{self.version}"
+        distances = project.map_cache.get_array(key)
+        if distances is None:
+            distances = project.map_cache.put_array(
+                key, distance_transform(self.grid == cell_type)
+            )
+        return distances
+
+    def room_sizes(self) -> np.ndarray:
+        key = f"roomsize:{self.version}"
+        sizes = project.map_cache.get_array(key)
+        if sizes is None:
+            labels, _ = project.map_validation.label_regions(
+                self.grid == project.map_grid.FLOOR
+            )
+            region_sizes = np.append(np.bincount(labels[labels >= 0]), 0)
+            sizes = project.map_cache.put_array(key, region_sizes[labels])
+        return sizes
+
+    def mask(self, constraints: Dict[str, Any]) -> np.ndarray:
+        """
+        Compiles placement constraints into the mask of cells that satisfy all of them.
+
+        Args:
+            constraints (Dict[str, Any]): Constraints as returned by parse_constraints.
+
+        Returns:
+            np.ndarray: A (height, width) boolean array of the valid cells.
+        """
+        allowed = np.ones(project.map_grid.CELL_TYPE_COUNT, dtype=bool)
+        if "onCellTypes" in constraints:
+            allowed[:] = False
+            allowed[[_cell_type(name) for name in constraints["onCellTypes"]]] = True
+        for name in constraints.get("notOnCellTypes", []):
+            allowed[_cell_type(name)] = False
+        mask = allowed[self.grid]
+        for name, distance in constraints.get("minDistanceFrom", {}).items():
+            mask &= self.distance_from(_cell_type(name)) >= int(distance)
+        for name, distance in constraints.get("maxDistanceFrom", {}).items():
+            mask &= self.distance_from(_cell_type(name)) <= int(distance)
+        if "minRoomSize" in constraints:
+            mask &= self.room_sizes() >= int(constraints["minRoomSize"])
+        return mask
+
+    def place(
+        self,
+        constraint_sets: List[Dict[str, Any]],
+        occupied: Optional[np.ndarray] = None,
+        seed: Optional[int] = None,
+    ) -> np.ndarray:
+        """
+        Picks a distinct random valid cell for every item.
+
+        Items sharing the same constraints are placed together from a single mask, so placing thousands of items
+        costs one mask per distinct set of constraints.
+
+        Args:
+            constraint_sets (List[Dict[str, Any]]): The parsed constraints of every item.
+            occupied (Optional[np.ndarray]): A (height, width) boolean array of cells already taken by other items.
+            seed (Optional[int]): Seed for the random choice of cells.
+
+        Returns:
+            np.ndarray: An (items, 2) array with the x and y of every item, or -1 for items no free valid cell was left for.
+        """
+        rng = np.random.default_rng(seed)
+        taken = (
+            np.zeros(self.grid.shape, dtype=bool)
+            if occupied is None
+            else occupied.copy()
+        )
+        positions = np.full((len(constraint_sets), 2), -1, dtype=np.int64)
+        for indexes in _group_by_constraints(constraint_sets):
+            candidates = np.flatnonzero(self.mask(constraint_sets[indexes[0]]) & ~taken)
+            chosen = rng.choice(
+                candidates, size=min(len(indexes), len(candidates)), replace=False
+            )
+            taken.ravel()[chosen] = True
+            rows, columns = np.divmod(chosen, self.grid.shape[1])
+            positions[indexes[: len(chosen)], 0] = columns
+            positions[indexes[: len(chosen)], 1] = rows
+        return positions
+
+    def validate(
+        self, constraint_sets: List[Dict[str, Any]], positions: np.ndarray
+    ) -> np.ndarray:
+        """
+        Checks the position of every item against its constraints, one mask per distinct set of constraints.
+
+        Args:
+            constraint_sets (List[Dict[str, Any]]): The parsed constraints of every item.
+            positions (np.ndarray): An (items, 2) array with the x and y of every item.
+
+        Returns:
+            np.ndarray: A boolean array telling for every item whether its position satisfies its constraints.
+        """
+        height, width = self.grid.shape
+        x, y = positions[:, 0], positions[:, 1]
+        valid = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        for indexes in _group_by_constraints(constraint_sets):
+            indexes = np.asarray(indexes)
+            inside = indexes[valid[indexes]]
+            valid[inside] = self.mask(constraint_sets[indexes[0]])[y[inside], x[inside]]
+        return valid
+
+
+def item_position(metaData: Any) -> Optional[Dict[str, int]]:
+    """
+    Reads the position stored in the metadata of an item.
+
+    Args:
+        metaData (Any): The metaData column of an Item record, as an object or a JSON string of one.
+
+    Returns:
+        Optional[Dict[str, int]]: The "x" and "y" of the item, or None if it has not been placed.
+    """
+    if isinstance(metaData, str):
+        metaData = json.loads(metaData)
+    if not isinstance(metaData, dict):
+        return None
+    return metaData.get("position")
+
+
+def occupied_mask(items: List[Any], shape: Tuple[int, int]) -> np.ndarray:
+    """
+    Marks the cells taken by already placed items.
+
+    Args:
+        items (List[Any]): Item records of a map.
+        shape (Tuple[int, int]): The (height, width) of the map grid.
+
+    Returns:
+        np.ndarray: A (height, width) boolean array of the taken cells.
+    """
+    occupied = np.zeros(shape, dtype=bool)
+    positions = [item_position(item.metaData) for item in items]
+    cells = np.array(
+        [[position["y"], position["x"]] for position in positions if position],
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    inside = (
+        (cells[:, 0] >= 0)
+        & (cells[:, 0] < shape[0])
+        & (cells[:, 1] >= 0)
+        & (cells[:, 1] < shape[1])
+    )
+    occupied[cells[inside, 0], cells[inside, 1]] = True
+    return occupied
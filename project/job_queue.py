@@ -0,0 +1,196 @@
+import asyncio
+import base64
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+import project.generate_map_service
+import project.map_render
+import project.storage
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", 100))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+JOB_RESULT_TTL = float(os.environ.get("JOB_RESULT_TTL", 3600))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 1))
+JOB_HEARTBEAT_INTERVAL = float(os.environ.get("JOB_HEARTBEAT_INTERVAL", 5))
+JOB_STALE_AFTER = 6 * JOB_HEARTBEAT_INTERVAL
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = [SUCCEEDED, FAILED, CANCELLED]
+
+
+class JobQueueFull(Exception):
+    """
+    Raised when a job is submitted while the queue of this worker is full.
+    """
+
+
+async def _run_generate(params: Dict[str, Any]) -> Dict[str, Any]:
+    res = await project.generate_map_service.generate_map(
+        params["gameStateId"],
+        params["map_size"],
+        params["room_sizes"],
+        params["corridor_width"],
+    )
+    return await asyncio.to_thread(res.model_dump, mode="json")
+
+
+async def _run_render(params: Dict[str, Any]) -> Dict[str, Any]:
+    game_state = await project.storage.get_storage().game_states.find(
+        params["gameStateId"], include_maps=True
+    )
+    if not game_state or not game_state.Maps:
+        raise ValueError("GameState or Map not found for the provided ID.")
+    png = project.map_render.cached_map_png(game_state.Maps[0])
+    if png is None:
+        png = await asyncio.wrap_future(
+            project.map_render.submit_map_png(game_state.Maps[0])
+        )
+    return {"mapImage": base64.b64encode(png).decode("utf-8")}
+
+
+EXECUTORS: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {
+    "generate": _run_generate,
+    "render": _run_render,
+}
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobQueue:
+    """
+    Runs the background jobs of this worker process.
+
+    Jobs live in the Job table of the storage backend; this queue only holds the identifiers of up to JOB_QUEUE_SIZE
+    jobs waiting for one of JOB_WORKERS runners. A runner claims a job by switching it from queued to running, so a
+    job offered to several workers runs once. Renders run in the render process pool. While a job runs its row is
+    touched every JOB_HEARTBEAT_INTERVAL seconds; jobs whose worker died stop being touched and are put back in the
+    queue after JOB_STALE_AFTER seconds, and every JOB_POLL_INTERVAL seconds each worker refills its queue from
+    the queued jobs in the table and deletes finished jobs older than JOB_RESULT_TTL.
+    """
+
+    def __init__(self):
+        self.queue: Optional[asyncio.Queue] = None
+        self.offered: Set[str] = set()
+        self.running: Dict[str, asyncio.Task] = {}
+        self.tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """
+        Starts the runners and the maintenance loop on the running event loop.
+        """
+        self.queue = asyncio.Queue(JOB_QUEUE_SIZE)
+        self.tasks = [asyncio.create_task(self._runner()) for _ in range(JOB_WORKERS)]
+        self.tasks.append(asyncio.create_task(self._maintain()))
+
+    async def stop(self) -> None:
+        """
+        Stops the runners, putting the jobs they were running back in the queue for the next start.
+        """
+        interrupted = list(self.running)
+        for task in self.tasks + list(self.running.values()):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        jobs = project.storage.get_storage().jobs
+        for job_id in interrupted:
+            await jobs.transition(job_id, [RUNNING], {"status": QUEUED})
+
+    def full(self) -> bool:
+        """
+        Tells whether this worker's queue has no room for another job.
+        """
+        return self.queue is None or self.queue.full()
+
+    def offer(self, job_id: str) -> bool:
+        """
+        Puts a queued job in this worker's queue.
+
+        Args:
+            job_id (str): The identifier of the job.
+
+        Returns:
+            bool: Whether the job was taken; when the queue is full the job stays queued in the table for later.
+        """
+        if job_id in self.offered:
+            return True
+        if self.full():
+            return False
+        self.queue.put_nowait(job_id)
+        self.offered.add(job_id)
+        return True
+
+    def cancel(self, job_id: str) -> None:
+        """
+        Stops a job if it is running on this worker.
+
+        Args:
+            job_id (str): The identifier of the job.
+        """
+        task = self.running.get(job_id)
+        if task is not None:
+            task.cancel()
+
+    async def _runner(self) -> None:
+        jobs = project.storage.get_storage().jobs
+        while True:
+            job_id = await self.queue.get()
+            self.offered.discard(job_id)
+            try:
+                job = await jobs.transition(job_id, [QUEUED], {"status": RUNNING})
+                if job is None:
+                    continue
+                task = asyncio.create_task(self._execute(job))
+                self.running[job_id] = task
+                heartbeat = asyncio.create_task(self._heartbeat(job_id, task))
+                try:
+                    await asyncio.wait([task])
+                finally:
+                    heartbeat.cancel()
+                    self.running.pop(job_id, None)
+            except Exception:
+                logger.exception("Error running job %s", job_id)
+
+    async def _execute(self, job: project.storage.JobRecord) -> None:
+        jobs = project.storage.get_storage().jobs
+        try:
+            result = await EXECUTORS[job.kind](job.params)
+            update = {"status": SUCCEEDED, "result": result}
+        except Exception as e:
+            update = {"status": FAILED, "error": str(e)}
+        update["expiresAt"] = _now() + timedelta(seconds=JOB_RESULT_TTL)
+        await jobs.transition(job.id, [RUNNING], update)
+
+    async def _heartbeat(self, job_id: str, task: asyncio.Task) -> None:
+        jobs = project.storage.get_storage().jobs
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+            if await jobs.transition(job_id, [RUNNING], {"updatedAt": _now()}) is None:
+                task.cancel()
+                return
+
+    async def _maintain(self) -> None:
+        jobs = project.storage.get_storage().jobs
+        while True:
+            try:
+                await jobs.delete_expired(_now())
+                await jobs.requeue_stale(_now() - timedelta(seconds=JOB_STALE_AFTER))
+                free = self.queue.maxsize - self.queue.qsize()
+                if free > 0:
+                    for job_id in await jobs.list_queued(free):
+                        self.offer(job_id)
+            except Exception:
+                logger.exception("Error maintaining the job queue")
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+
+job_queue = JobQueue()
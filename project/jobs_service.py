@@ -0,0 +1,182 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import project.job_queue
+import project.storage
+from pydantic import BaseModel
+
+JOB_EVENTS_POLL_INTERVAL = float(os.environ.get("JOB_EVENTS_POLL_INTERVAL", 0.5))
+JOB_EVENTS_KEEPALIVE = 15
+
+
+class JobResponse(BaseModel):
+    """
+    The state of a background job, with its result once it has succeeded or its error once it has failed.
+    """
+
+    jobId: str
+    kind: str
+    status: str
+    createdAt: datetime
+    updatedAt: datetime
+    expiresAt: Optional[datetime] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+def _response(job: project.storage.JobRecord) -> JobResponse:
+    return JobResponse(
+        jobId=job.id,
+        kind=job.kind,
+        status=job.status,
+        createdAt=job.createdAt,
+        updatedAt=job.updatedAt,
+        expiresAt=job.expiresAt,
+        result=job.result,
+        error=job.error,
+    )
+
+
+async def _submit(kind: str, params: Dict[str, Any]) -> JobResponse:
+    queue = project.job_queue.job_queue
+    if queue.full():
+        raise project.job_queue.JobQueueFull("The job queue is full, please retry.")
+    job = await project.storage.get_storage().jobs.create(
+        {"kind": kind, "params": params}
+    )
+    queue.offer(job.id)
+    return _response(job)
+
+
+async def submit_generate_job(
+    gameStateId: str, map_size: str, room_sizes: List[str], corridor_width: int
+) -> JobResponse:
+    """
+    Queues the generation of a new map, returning at once with the job that will run it.
+
+    Args:
+        gameStateId (str): The unique identifier of the game state the map belongs to.
+        map_size (str): Defines the size of the map grid, e.g., "10x10".
+        room_sizes (List[str]): Specifies the sizes of rooms to generate within the map, e.g., ["5x5", "3x4"].
+        corridor_width (int): Width of the corridors connecting rooms, typically 1 or 2 cells.
+
+    Returns:
+        JobResponse: The state of a background job, with its result once it has succeeded or its error once it has failed.
+
+    Once the job has succeeded its result holds the fields of GenerateMapResponse.
+    """
+    return await _submit(
+        "generate",
+        {
+            "gameStateId": gameStateId,
+            "map_size": map_size,
+            "room_sizes": room_sizes,
+            "corridor_width": corridor_width,
+        },
+    )
+
+
+async def submit_render_job(gameStateId: str) -> JobResponse:
+    """
+    Queues the rendering of the map of a game state, returning at once with the job that will run it.
+
+    Args:
+        gameStateId (str): The unique identifier for the game state whose map is to be rendered.
+
+    Returns:
+        JobResponse: The state of a background job, with its result once it has succeeded or its error once it has failed.
+
+    Once the job has succeeded its result holds the fields of FetchMapResponse.
+    """
+    return await _submit("render", {"gameStateId": gameStateId})
+
+
+async def _find(jobId: str) -> project.storage.JobRecord:
+    job = await project.storage.get_storage().jobs.find(jobId)
+    if job is None or (
+        job.expiresAt is not None and job.expiresAt < datetime.now(timezone.utc)
+    ):
+        raise ValueError("Job not found for the provided ID.")
+    return job
+
+
+async def get_job(jobId: str) -> JobResponse:
+    """
+    Fetches the state of a background job.
+
+    Args:
+        jobId (str): The unique identifier of the job.
+
+    Returns:
+        JobResponse: The state of a background job, with its result once it has succeeded or its error once it has failed.
+
+    Finished jobs are kept for JOB_RESULT_TTL seconds.
+    """
+    return _response(await _find(jobId))
+
+
+async def cancel_job(jobId: str) -> JobResponse:
+    """
+    Cancels a background job that has not finished yet.
+
+    Args:
+        jobId (str): The unique identifier of the job.
+
+    Returns:
+        JobResponse: The state of a background job, with its result once it has succeeded or its error once it has failed.
+
+    Queued jobs are never started. Running jobs are stopped by the worker running them, within
+    JOB_HEARTBEAT_INTERVAL seconds when that is another worker. Cancelling a finished job leaves it unchanged.
+    """
+    await _find(jobId)
+    cancelled = await project.storage.get_storage().jobs.transition(
+        jobId,
+        [project.job_queue.QUEUED, project.job_queue.RUNNING],
+        {
+            "status": project.job_queue.CANCELLED,
+            "expiresAt": datetime.now(timezone.utc)
+            + timedelta(seconds=project.job_queue.JOB_RESULT_TTL),
+        },
+    )
+    if cancelled is None:
+        return _response(await _find(jobId))
+    project.job_queue.job_queue.cancel(jobId)
+    return _response(cancelled)
+
+
+async def stream_job_events(jobId: str) -> AsyncIterator[bytes]:
+    """
+    Streams the state of a background job as server-sent events until it has finished.
+
+    Args:
+        jobId (str): The unique identifier of the job.
+
+    Returns:
+        AsyncIterator[bytes]: A "status" event with the JobResponse every time the status changes, the last one carrying the result or error, and a keepalive comment every JOB_EVENTS_KEEPALIVE seconds in between.
+    """
+    job = await _find(jobId)
+
+    async def stream() -> AsyncIterator[bytes]:
+        current = job
+        status = None
+        last_sent = time.monotonic()
+        while True:
+            if current.status != status:
+                status = current.status
+                last_sent = time.monotonic()
+                data = _response(current).model_dump_json()
+                yield f"event: status\ndata: {data}\n\n".encode("utf-8")
+                if status in project.job_queue.FINISHED_STATUSES:
+                    return
+            elif time.monotonic() - last_sent >= JOB_EVENTS_KEEPALIVE:
+                last_sent = time.monotonic()
+                yield b": keepalive\n\n"
+            await asyncio.sleep(JOB_EVENTS_POLL_INTERVAL)
+            current = await project.storage.get_storage().jobs.find(jobId)
+            if current is None:
+                return
+
+    return stream()
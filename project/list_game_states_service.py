@@ -0,0 +1,80 @@
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import project.storage
+from pydantic import BaseModel
+
+MAX_PAGE_SIZE = 100
+
+
+class GameStateSummary(BaseModel):
+    """
+    A lightweight view of a saved game state, without its saved data.
+    """
+
+    gameStateId: str
+    createdAt: datetime
+    updatedAt: datetime
+
+
+class ListGameStatesResponse(BaseModel):
+    """
+    One page of a user's saved game states, newest first, with the cursor to pass back for the next page.
+    """
+
+    saves: List[GameStateSummary]
+    nextCursor: Optional[str] = None
+
+
+def _encode_cursor(updated_at: datetime, game_state_id: str) -> str:
+    return base64.urlsafe_b64encode(
+        json.dumps([updated_at.isoformat(), game_state_id]).encode("utf-8")
+    ).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        updated_at, game_state_id = json.loads(base64.urlsafe_b64decode(cursor))
+        return datetime.fromisoformat(updated_at), game_state_id
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor.") from None
+
+
+async def list_game_states(
+    userId: str, cursor: Optional[str] = None, limit: int = 20
+) -> ListGameStatesResponse:
+    """
+    Lists the saved game states of a user, newest first.
+
+    Args:
+        userId (str): Identifier for the user whose saves are listed.
+        cursor (Optional[str]): The nextCursor of the previous page, omitted for the first page.
+        limit (int): The maximum number of saves to return, up to MAX_PAGE_SIZE.
+
+    Returns:
+        ListGameStatesResponse: One page of a user's saved game states, newest first, with the cursor to pass back for the next page.
+
+    Pages are found with keyset pagination on (updatedAt, id) over the (userId, updatedAt) index, so every page costs
+    the same however many saves the user has, and the saved data column is never read.
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"Limit must be between 1 and {MAX_PAGE_SIZE}.")
+    rows = await project.storage.get_storage().game_states.list_page(
+        userId, None if cursor is None else _decode_cursor(cursor), limit + 1
+    )
+    page = rows[:limit]
+    return ListGameStatesResponse(
+        saves=[
+            GameStateSummary(
+                gameStateId=row.id, createdAt=row.createdAt, updatedAt=row.updatedAt
+            )
+            for row in page
+        ],
+        nextCursor=(
+            _encode_cursor(page[-1].updatedAt, page[-1].id)
+            if len(rows) > limit
+            else None
+        ),
+    )
@@ -1,8 +1,7 @@
 import json
 from typing import Any, Dict, List
 
-import prisma
-import prisma.models
+import project.storage
 from pydantic import BaseModel
 
 
@@ -28,13 +27,16 @@ async def load_game(gameStateId: str) -> LoadGameStateResponse:
     Returns:
         LoadGameStateResponse: Provides the loaded game state data, allowing the player to resume their game from where they left off. Includes the map state, player position, inventory items, and any other relevant game details contained in the saved state.
     """
-    game_state = await prisma.models.GameState.prisma().find_unique(
-        where={"id": gameStateId},
-        include={"Maps": {"include": {"Items": True, "NPCs": True}}},
+    game_state = await project.storage.get_storage().game_states.find(
+        gameStateId, include_map_contents=True
     )
     if game_state is None:
         raise ValueError("Game state not found")
-    data = json.loads(game_state.data)
+    data = (
+        json.loads(game_state.data)
+        if isinstance(game_state.data, str)
+        else game_state.data
+    )
     map_state = data["mapState"] if "mapState" in data else []
     player_position = data["playerPosition"] if "playerPosition" in data else {}
     inventory_items = [
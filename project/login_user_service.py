@@ -1,6 +1,5 @@
 import bcrypt
-import prisma
-import prisma.models
+import project.storage
 from pydantic import BaseModel
 
 
@@ -32,7 +31,7 @@ async def login_user(email: str, password: str) -> UserLoginResponse:
         print(response)
         > UserLoginResponse(session_token="generated_token", message="Login successful")
     """
-    user = await prisma.models.User.prisma().find_unique(where={"email": email})
+    user = await project.storage.get_storage().users.find_by_email(email)
     if user and bcrypt.checkpw(password.encode("utf-8"), user.password.encode("utf-8")):
         session_token = "example_generated_session_token_for_demo"
         return UserLoginResponse(
@@ -0,0 +1,237 @@
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+import project.grid_store
+import project.map_grid
+
+MAP_CACHE_DIR = os.environ.get(
+    "MAP_CACHE_DIR",
+    os.path.join(
+        "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+        "maze-map-cache",
+    ),
+)
+MAP_CACHE_MAX_BYTES = int(os.environ.get("MAP_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+MAP_CACHE_OPEN_ENTRIES = 64
+MAP_CACHE_TOUCH_INTERVAL = 10
+
+_MAGIC = b"MZC1"
+_HEADER = struct.Struct("<4s8sI")
+_ALIGNMENT = 64
+
+_open_entries: "OrderedDict[str, Any]" = OrderedDict()
+_touched: Dict[str, float] = {}
+_written_bytes = 0
+
+
+def _entry_path(key: str, kind: str) -> str:
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.join(MAP_CACHE_DIR, f"{digest}.{kind}")
+
+
+def _remember(path: str, entry: Any) -> Any:
+    _open_entries[path] = entry
+    _open_entries.move_to_end(path)
+    _touched[path] = time.monotonic()
+    while len(_open_entries) > MAP_CACHE_OPEN_ENTRIES:
+        _touched.pop(_open_entries.popitem(last=False)[0], None)
+    return entry
+
+
+def _recall(path: str) -> Any:
+    _open_entries.move_to_end(path)
+    now = time.monotonic()
+    if now - _touched.get(path, 0) >= MAP_CACHE_TOUCH_INTERVAL:
+        _touched[path] = now
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+    return _open_entries[path]
+
+
+def _map_file(path: str) -> Optional[mmap.mmap]:
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        os.utime(path)
+    except (FileNotFoundError, ValueError):
+        return None
+    return mapped
+
+
+def _write_atomic(path: str, *chunks: Any) -> None:
+    global _written_bytes
+    os.makedirs(MAP_CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=MAP_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+            _written_bytes += f.tell()
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    if _written_bytes > MAP_CACHE_MAX_BYTES // 8:
+        _written_bytes = 0
+        _evict()
+
+
+def _evict() -> None:
+    """
+    Removes the least recently used entries until the cache directory fits into MAP_CACHE_MAX_BYTES.
+
+    Entries are ordered by modification time, which every lookup refreshes: on mapping the file, and at most every
+    MAP_CACHE_TOUCH_INTERVAL seconds per worker for hits served from its open entries.
+
+    Workers that still have an evicted entry mapped keep reading their copy until they drop it from their open entries.
+    """
+    entries = []
+    total = 0
+    with os.scandir(MAP_CACHE_DIR) as it:
+        for entry in it:
+            if entry.name.endswith(".tmp"):
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+    entries.sort()
+    for _, size, path in entries:
+        if total <= MAP_CACHE_MAX_BYTES:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def get_array(key: str) -> Optional[np.ndarray]:
+    """
+    Looks up an array stored by any worker under the given key.
+
+    Args:
+        key (str): The cache key, which must change whenever the cached content would.
+
+    Returns:
+        Optional[np.ndarray]: A read-only array backed directly by the shared cache file, or None on a miss.
+    """
+    path = _entry_path(key, "npy")
+    if path in _open_entries:
+        return _recall(path)
+    mapped = _map_file(path)
+    if mapped is None:
+        return None
+    magic, dtype, ndim = _HEADER.unpack_from(mapped, 0)
+    if magic != _MAGIC:
+        return None
+    shape = struct.unpack_from(f"<{ndim}Q", mapped, _HEADER.size)
+    offset = -(-(_HEADER.size + 8 * ndim) // _ALIGNMENT) * _ALIGNMENT
+    dtype = np.dtype(dtype.rstrip(b"\0").decode("ascii"))
+    array = np.frombuffer(
+        mapped, dtype=dtype, count=int(np.prod(shape)), offset=offset
+    ).reshape(shape)
+    return _remember(path, array)
+
+
+def put_array(key: str, array: np.ndarray) -> np.ndarray:
+    """
+    Publishes an array to the shared cache so every worker can map it.
+
+    Args:
+        key (str): The cache key, which must change whenever the cached content would.
+        array (np.ndarray): The array to store.
+
+    Returns:
+        np.ndarray: The array that was passed in, for chaining.
+    """
+    contiguous = np.ascontiguousarray(array)
+    header = _HEADER.pack(
+        _MAGIC, contiguous.dtype.str.encode("ascii"), contiguous.ndim
+    ) + struct.pack(f"<{contiguous.ndim}Q", *contiguous.shape)
+    padding = b"\0" * (-len(header) % _ALIGNMENT)
+    _write_atomic(_entry_path(key, "npy"), header, padding, contiguous.tobytes())
+    return array
+
+
+def get_bytes(key: str) -> Optional[memoryview]:
+    """
+    Looks up a byte string, such as a rendered PNG, stored by any worker under the given key.
+
+    Args:
+        key (str): The cache key, which must change whenever the cached content would.
+
+    Returns:
+        Optional[memoryview]: A read-only view over the shared cache file, or None on a miss.
+    """
+    path = _entry_path(key, "bin")
+    if path in _open_entries:
+        return _recall(path)
+    mapped = _map_file(path)
+    if mapped is None:
+        return None
+    return _remember(path, memoryview(mapped))
+
+
+def put_bytes(key: str, data: bytes) -> bytes:
+    """
+    Publishes a byte string to the shared cache so every worker can map it.
+
+    Args:
+        key (str): The cache key, which must change whenever the cached content would.
+        data (bytes): The content to store.
+
+    Returns:
+        bytes: The data that was passed in, for chaining.
+    """
+    _write_atomic(_entry_path(key, "bin"), data)
+    return data
+
+
+def map_version(project_map: Any) -> str:
+    """
+    Builds the cache key prefix for a map, which changes whenever the map row is updated.
+
+    Args:
+        project_map (Any): A ProjectMap record.
+
+    Returns:
+        str: The identifier and last update time of the map, plus the write counter of maps kept in the grid store.
+    """
+    version = f"{project_map.id}@{project_map.updatedAt.isoformat()}"
+    if project.grid_store.is_stored(project_map.cells):
+        version += f"#{project.grid_store.generation(project_map.id)}"
+    return version
+
+
+def get_map_grid(project_map: Any) -> np.ndarray:
+    """
+    Returns the decoded grid of a map, decoding and publishing it to the shared cache on a miss.
+
+    Maps kept in the grid store are already shared through their memory-mapped grid file and are returned as is,
+    without reading any cells.
+
+    Args:
+        project_map (Any): A ProjectMap record.
+
+    Returns:
+        np.ndarray: A read-only (height, width) array of cell types.
+    """
+    if project.grid_store.is_stored(project_map.cells):
+        return project.grid_store.open_grid(project_map.id)
+    key = f"grid:{map_version(project_map)}"
+    grid = get_array(key)
+    if grid is None:
+        grid = put_array(key, project.map_grid.decode_cells(project_map.cells))
+        grid.setflags(write=False)
+    return grid
@@ -0,0 +1,41 @@
+import json
+from typing import Any
+
+import numpy as np
+
+UNKNOWN = 0
+FLOOR = 1
+CORRIDOR = 2
+WALL = 3
+DOOR = 4
+START = 5
+END = 6
+
+CELL_TYPE_COUNT = 7
+CELL_TYPE_NAMES = ["unknown", "floor", "corridor", "wall", "door", "start", "end"]
+
+WALKABLE = np.zeros(CELL_TYPE_COUNT, dtype=bool)
+WALKABLE[[FLOOR, CORRIDOR, DOOR, START, END]] = True
+
+
+def decode_cells(cells: Any) -> np.ndarray:
+    """
+    Decodes the cells of a map into a two-dimensional uint8 grid of cell types.
+
+    Args:
+        cells (Any): The cells as stored in the `ProjectMap.cells` JSON column or sent in a map state, either a list of rows,
+            a JSON string of one, or an object holding them under a "cells" key.
+
+    Returns:
+        np.ndarray: A (height, width) array of cell type values.
+    """
+    if isinstance(cells, str):
+        cells = json.loads(cells)
+    if isinstance(cells, dict):
+        cells = cells.get("cells", [])
+    grid = np.asarray(cells, dtype=np.uint8)
+    if grid.size == 0:
+        return np.zeros((0, 0), dtype=np.uint8)
+    if grid.ndim != 2:
+        raise ValueError("Map cells must be a rectangular list of rows.")
+    return grid
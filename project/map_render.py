@@ -0,0 +1,215 @@
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from io import BytesIO
+from types import SimpleNamespace
+from typing import Any, Optional, Tuple
+
+import numpy as np
+import project.map_cache
+import project.map_grid
+from matplotlib import colormaps
+from matplotlib.image import imsave
+
+CELL_PIXELS = 8
+MAX_RENDER_PIXELS = 4096
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", os.cpu_count() or 1))
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+
+PALETTE = (
+    colormaps["terrain"](np.linspace(0.0, 1.0, project.map_grid.CELL_TYPE_COUNT)) * 255
+).astype(np.uint8)
+
+
+def cell_pixels(shape: Tuple[int, ...]) -> int:
+    """
+    Picks how many pixels each cell spans so that a map of the given shape stays within MAX_RENDER_PIXELS per side.
+
+    Args:
+        shape (Tuple[int, ...]): The (height, width) of the map grid.
+
+    Returns:
+        int: The side length of one cell in pixels, at least 1.
+    """
+    return max(1, min(CELL_PIXELS, MAX_RENDER_PIXELS // max(max(shape, default=1), 1)))
+
+
+def render_stride(shape: Tuple[int, ...]) -> int:
+    """
+    Picks the stride at which render_png samples the cells of a map of the given shape.
+
+    Args:
+        shape (Tuple[int, ...]): The (height, width) of the map grid.
+
+    Returns:
+        int: Every how many rows and columns a cell is rendered, 1 for maps that fit into MAX_RENDER_PIXELS.
+    """
+    return max(1, -(-max(shape, default=1) // MAX_RENDER_PIXELS))
+
+
+def render_png(grid: np.ndarray, cell_px: Optional[int] = None) -> bytes:
+    """
+    Renders a grid of cell types as a PNG image, coloring each cell type from the terrain colormap.
+
+    Maps wider or taller than MAX_RENDER_PIXELS cells are sampled at a fixed stride, so a memory-mapped grid only
+    has the sampled rows read from disk.
+
+    Args:
+        grid (np.ndarray): A (height, width) array of cell types.
+        cell_px (Optional[int]): The side length of one cell in pixels, defaults to cell_pixels(grid.shape).
+
+    Returns:
+        bytes: The encoded PNG image.
+    """
+    if grid.size == 0:
+        grid = np.zeros((1, 1), dtype=np.uint8)
+    step = render_stride(grid.shape)
+    if step > 1:
+        grid = grid[::step, ::step]
+    if cell_px is None:
+        cell_px = cell_pixels(grid.shape)
+    return encode_png(colorize(grid, cell_px))
+
+
+def colorize(grid: np.ndarray, cell_px: int) -> np.ndarray:
+    """
+    Converts a grid of cell types into RGBA pixels, with every cell spanning cell_px by cell_px pixels.
+
+    Args:
+        grid (np.ndarray): A (height, width) array of cell types.
+        cell_px (int): The side length of one cell in pixels.
+
+    Returns:
+        np.ndarray: A (height * cell_px, width * cell_px, 4) array of uint8 RGBA pixels.
+    """
+    rgba = PALETTE[np.minimum(grid, project.map_grid.CELL_TYPE_COUNT - 1)]
+    if cell_px > 1:
+        rgba = rgba.repeat(cell_px, axis=0).repeat(cell_px, axis=1)
+    return rgba
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    """
+    Encodes RGBA pixels as a PNG image.
+
+    Args:
+        rgba (np.ndarray): A (height, width, 4) array of uint8 RGBA pixels.
+
+    Returns:
+        bytes: The encoded PNG image.
+    """
+    buf = BytesIO()
+    imsave(buf, rgba, format="png")
+    return buf.getvalue()
+
+
+def reduce_grid(grid: np.ndarray, factor: int) -> np.ndarray:
+    """
+    Downsamples a grid by keeping the most important cell type of every factor by factor block.
+
+    Cell types are numbered in increasing order of importance for overviews (unknown, floor, corridor, wall, door,
+    start, end), so the reduction is a block maximum. Cells beyond the edge of the grid count as unknown. The grid
+    is reduced one band of rows at a time, so memory use stays proportional to the width of the grid.
+
+    Args:
+        grid (np.ndarray): A (height, width) array of cell types.
+        factor (int): The side length of the blocks that are reduced to a single cell.
+
+    Returns:
+        np.ndarray: A (ceil(height / factor), ceil(width / factor)) array of cell types.
+    """
+    if factor == 1:
+        return np.asarray(grid)
+    height, width = grid.shape
+    reduced_width = -(-width // factor)
+    reduced = np.zeros((-(-height // factor), reduced_width), dtype=np.uint8)
+    band = np.zeros(reduced_width * factor, dtype=np.uint8)
+    for row in range(reduced.shape[0]):
+        band[:width] = grid[row * factor : (row + 1) * factor].max(axis=0)
+        reduced[row] = band.reshape(reduced_width, factor).max(axis=1)
+    return reduced
+
+
+def cached_map_png(project_map: Any) -> Optional[memoryview]:
+    """
+    Looks up the rendered PNG of a map in the shared cache without rendering it.
+
+    Args:
+        project_map (Any): A ProjectMap record.
+
+    Returns:
+        Optional[memoryview]: The encoded PNG image, or None if no worker has rendered this version of the map yet.
+    """
+    return project.map_cache.get_bytes(
+        f"png:{project.map_cache.map_version(project_map)}"
+    )
+
+
+def get_map_png(project_map: Any) -> memoryview | bytes:
+    """
+    Returns the rendered PNG of a map, rendering and publishing it to the shared cache on a miss.
+
+    Args:
+        project_map (Any): A ProjectMap record.
+
+    Returns:
+        memoryview | bytes: The encoded PNG image.
+    """
+    png = cached_map_png(project_map)
+    if png is None:
+        png = project.map_cache.put_bytes(
+            f"png:{project.map_cache.map_version(project_map)}",
+            render_png(project.map_cache.get_map_grid(project_map)),
+        )
+    return png
+
+
+def _render_map_in_worker(project_map: Any) -> bytes:
+    return bytes(get_map_png(project_map))
+
+
+def get_render_pool() -> ProcessPoolExecutor:
+    """
+    Returns the process pool that renders maps off the event loop, starting it on first use.
+
+    Returns:
+        ProcessPoolExecutor: A pool of RENDER_WORKERS spawned processes.
+    """
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = ProcessPoolExecutor(
+            max_workers=RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _render_pool
+
+
+def shutdown_render_pool() -> None:
+    """
+    Stops the render process pool if it was started, dropping renders that have not begun.
+    """
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(wait=False, cancel_futures=True)
+        _render_pool = None
+
+
+def submit_map_png(project_map: Any) -> Future:
+    """
+    Renders a map in the render process pool, which publishes the PNG to the shared cache as well.
+
+    Args:
+        project_map (Any): A ProjectMap record.
+
+    Returns:
+        Future: A future resolving to the encoded PNG image.
+    """
+    return get_render_pool().submit(
+        _render_map_in_worker,
+        SimpleNamespace(
+            id=project_map.id,
+            updatedAt=project_map.updatedAt,
+            cells=project_map.cells,
+        ),
+    )
@@ -0,0 +1,197 @@
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+import project.map_cache
+import project.map_grid
+from pydantic import BaseModel
+
+MAX_REPORTED_PROBLEMS = 100
+
+
+class CellPosition(BaseModel):
+    """
+    The column and row of a single cell of a map.
+    """
+
+    x: int
+    y: int
+
+
+class OrphanedRoom(BaseModel):
+    """
+    A walkable region of a map that cannot be reached from the start cell, identified by one of its cells.
+    """
+
+    x: int
+    y: int
+    size: int
+
+
+class MapValidationReport(BaseModel):
+    """
+    Describes whether a map is playable: whether the end can be reached from the start, which walkable regions are cut off and which doors lead nowhere.
+    """
+
+    playable: bool
+    startFound: bool
+    endFound: bool
+    endReachable: bool
+    regionCount: int
+    orphanedRoomCount: int
+    orphanedRooms: List[OrphanedRoom]
+    invalidDoorCount: int
+    invalidDoors: List[CellPosition]
+
+
+def label_regions(mask: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    Labels the 4-connected regions of a boolean grid.
+
+    Every horizontal run of set cells becomes a node, runs touching vertically are joined, and the resulting run
+    graph is solved with a vectorized union-find that alternates hooking roots onto smaller roots with pointer
+    jumping, so no Python loop runs per cell or per run.
+
+    Args:
+        mask (np.ndarray): A (height, width) boolean array of the cells to label.
+
+    Returns:
+        Tuple[np.ndarray, int]: A (height, width) int32 array holding the region of each set cell, numbered from 0,
+            and -1 elsewhere, along with the number of regions.
+    """
+    labels = np.full(mask.shape, -1, dtype=np.int32)
+    if not mask.any():
+        return labels, 0
+    starts = mask.copy()
+    starts[:, 1:] &= ~mask[:, :-1]
+    run_ids = (np.cumsum(starts, axis=None) - 1).reshape(mask.shape)
+    run_count = int(run_ids[-1, -1]) + 1
+    touching = mask[:-1] & mask[1:]
+    upper, lower = run_ids[:-1][touching], run_ids[1:][touching]
+    parent = np.arange(run_count)
+    while upper.size:
+        root_upper, root_lower = parent[upper], parent[lower]
+        apart = root_upper != root_lower
+        upper, lower = upper[apart], lower[apart]
+        root_upper, root_lower = root_upper[apart], root_lower[apart]
+        np.minimum.at(
+            parent,
+            np.maximum(root_upper, root_lower),
+            np.minimum(root_upper, root_lower),
+        )
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+    roots, region_of_run = np.unique(parent, return_inverse=True)
+    labels[mask] = region_of_run[run_ids[mask]]
+    return labels, len(roots)
+
+
+def get_region_labels(project_map: Any) -> np.ndarray:
+    """
+    Returns the walkable region labels of a map, computing and publishing them to the shared cache on a miss.
+
+    Args:
+        project_map (Any): A ProjectMap record.
+
+    Returns:
+        np.ndarray: A (height, width) int32 array holding the region of each walkable cell and -1 elsewhere.
+    """
+    key = f"labels:{project.map_cache.map_version(project_map)}"
+    labels = project.map_cache.get_array(key)
+    if labels is None:
+        grid = project.map_cache.get_map_grid(project_map)
+        labels, _ = label_regions(project.map_grid.WALKABLE[grid])
+        project.map_cache.put_array(key, labels)
+    return labels
+
+
+def _first_cell(grid: np.ndarray, cell_type: int) -> Optional[Tuple[int, int]]:
+    found = np.flatnonzero(grid == cell_type)
+    if not found.size:
+        return None
+    return divmod(int(found[0]), grid.shape[1])
+
+
+def validate_grid(
+    grid: np.ndarray, labels: Optional[np.ndarray] = None
+) -> MapValidationReport:
+    """
+    Checks that a map is playable.
+
+    The end must be reachable from the start through walkable cells, every walkable region should be reachable from
+    the start, and every door must join walkable cells on two opposite sides.
+
+    Args:
+        grid (np.ndarray): A (height, width) array of cell types.
+        labels (Optional[np.ndarray]): Walkable region labels of the grid, computed when omitted.
+
+    Returns:
+        MapValidationReport: Describes whether a map is playable: whether the end can be reached from the start, which walkable regions are cut off and which doors lead nowhere.
+    """
+    walkable = project.map_grid.WALKABLE[grid]
+    if labels is None:
+        labels, _ = label_regions(walkable)
+    region_sizes = np.bincount(labels[labels >= 0])
+    start = _first_cell(grid, project.map_grid.START)
+    end = _first_cell(grid, project.map_grid.END)
+    start_region = labels[start] if start is not None else -1
+    end_reachable = (
+        start is not None and end is not None and labels[end] == start_region
+    )
+
+    orphaned = np.flatnonzero(region_sizes)
+    if start is not None:
+        orphaned = orphaned[orphaned != start_region]
+    else:
+        orphaned = orphaned[:0]
+    reported = orphaned[:MAX_REPORTED_PROBLEMS]
+    first_cells = np.full(len(region_sizes), labels.size, dtype=np.int64)
+    np.minimum.at(
+        first_cells, labels.ravel()[walkable.ravel()], np.flatnonzero(walkable)
+    )
+    orphaned_rooms = [
+        OrphanedRoom(
+            x=int(first_cells[region] % grid.shape[1]),
+            y=int(first_cells[region] // grid.shape[1]),
+            size=int(region_sizes[region]),
+        )
+        for region in reported
+    ]
+
+    padded = np.pad(walkable, 1)
+    joined = (padded[:-2, 1:-1] & padded[2:, 1:-1]) | (
+        padded[1:-1, :-2] & padded[1:-1, 2:]
+    )
+    invalid = np.argwhere((grid == project.map_grid.DOOR) & ~joined)
+    invalid_doors = [
+        CellPosition(x=int(x), y=int(y)) for y, x in invalid[:MAX_REPORTED_PROBLEMS]
+    ]
+
+    return MapValidationReport(
+        playable=bool(end_reachable) and not len(invalid),
+        startFound=start is not None,
+        endFound=end is not None,
+        endReachable=bool(end_reachable),
+        regionCount=int(np.count_nonzero(region_sizes)),
+        orphanedRoomCount=len(orphaned),
+        orphanedRooms=orphaned_rooms,
+        invalidDoorCount=len(invalid),
+        invalidDoors=invalid_doors,
+    )
+
+
+def validate_map(project_map: Any) -> MapValidationReport:
+    """
+    Checks that a stored map is playable, reusing its cached grid and region labels.
+
+    Args:
+        project_map (Any): A ProjectMap record.
+
+    Returns:
+        MapValidationReport: Describes whether a map is playable: whether the end can be reached from the start, which walkable regions are cut off and which doors lead nowhere.
+    """
+    return validate_grid(
+        project.map_cache.get_map_grid(project_map), get_region_labels(project_map)
+    )
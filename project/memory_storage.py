@@ -0,0 +1,534 @@
+import asyncio
+import bisect
+import gzip
+import json
+import logging
+import os
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from project.storage import (
+    BulkRepository,
+    GameStateRecord,
+    GameStateRepository,
+    ItemRecord,
+    ItemRepository,
+    JobRecord,
+    JobRepository,
+    MapRepository,
+    NpcRecord,
+    NpcRepository,
+    ProjectMapRecord,
+    Storage,
+    UserRecord,
+    UserRepository,
+)
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+STORAGE_SNAPSHOT_PATH = os.environ.get("STORAGE_SNAPSHOT_PATH", "")
+STORAGE_SNAPSHOT_INTERVAL = float(os.environ.get("STORAGE_SNAPSHOT_INTERVAL", 60))
+
+
+def _utc(value: datetime) -> datetime:
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+class MemoryTable:
+    """
+    The records of one model, indexed by identifier and by the identifier of the record they belong to.
+
+    Children of a parent are kept in insertion order, or sorted by sort_key when one is given. Like the foreign keys
+    of the database, a record can only be created under an existing parent, and a parent cannot be deleted while it
+    still has children.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model: Type[BaseModel],
+        parent_key: Optional[str] = None,
+        parent: Optional["MemoryTable"] = None,
+        sort_key: Optional[Callable[[Any], Any]] = None,
+    ):
+        self.name = name
+        self.model = model
+        self.parent_key = parent_key
+        self.parent = parent
+        self.sort_key = sort_key
+        self.dependents: List[MemoryTable] = []
+        if parent is not None:
+            parent.dependents.append(self)
+        self.rows: Dict[str, Any] = {}
+        self.children: Dict[str, Any] = {}
+        self.ids: Optional[List[str]] = None
+        self.timestamped = "updatedAt" in model.model_fields
+
+    def _index(self, record: Any) -> None:
+        if self.parent_key is None:
+            return
+        parent_id = getattr(record, self.parent_key)
+        if self.sort_key is None:
+            self.children.setdefault(parent_id, {})[record.id] = None
+        else:
+            bisect.insort(
+                self.children.setdefault(parent_id, []), self.sort_key(record)
+            )
+
+    def _unindex(self, record: Any) -> None:
+        if self.parent_key is None:
+            return
+        parent_id = getattr(record, self.parent_key)
+        siblings = self.children[parent_id]
+        if self.sort_key is None:
+            del siblings[record.id]
+        else:
+            del siblings[bisect.bisect_left(siblings, self.sort_key(record))]
+        if not siblings:
+            del self.children[parent_id]
+
+    def _check_parent(self, record: Any) -> None:
+        if self.parent is not None:
+            parent_id = getattr(record, self.parent_key)
+            if parent_id not in self.parent.rows:
+                raise ValueError(
+                    f"Foreign key {self.name}.{self.parent_key} references missing {self.parent.name} '{parent_id}'."
+                )
+
+    def check_unreferenced(self, id: str) -> None:
+        for dependent in self.dependents:
+            if id in dependent.children:
+                raise ValueError(
+                    f"{self.name} '{id}' is still referenced by {dependent.name} records."
+                )
+
+    def _build(self, data: Dict[str, Any]) -> Any:
+        values = {"id": str(uuid.uuid4()), **data}
+        if self.timestamped:
+            now = datetime.now(timezone.utc)
+            values.setdefault("createdAt", now)
+            values.setdefault("updatedAt", now)
+        record = self.model.model_validate(values)
+        if self.timestamped:
+            record.createdAt = _utc(record.createdAt)
+            record.updatedAt = _utc(record.updatedAt)
+        if record.id in self.rows:
+            raise ValueError(f"{self.name} '{record.id}' already exists.")
+        self._check_parent(record)
+        return record
+
+    def _store(self, record: Any) -> None:
+        self.ids = None
+        self.rows[record.id] = record
+        self._index(record)
+
+    def insert(self, data: Dict[str, Any]) -> Any:
+        record = self._build(data)
+        self._store(record)
+        return record
+
+    def insert_many(self, data: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Inserts many records, all or none of them: every record is checked before the first one is stored.
+        """
+        records = [self._build(values) for values in data]
+        if len({record.id for record in records}) < len(records):
+            raise ValueError(f"Duplicate {self.name} identifiers.")
+        for record in records:
+            self._store(record)
+        return records
+
+    def update(self, id: str, data: Dict[str, Any]) -> Optional[Any]:
+        record = self.rows.get(id)
+        if record is None:
+            return None
+        if self.timestamped:
+            data = {**data, "updatedAt": datetime.now(timezone.utc)}
+        updated = record.model_copy(update=data)
+        self._check_parent(updated)
+        self._unindex(record)
+        self.rows[id] = updated
+        self._index(updated)
+        return updated
+
+    def delete(self, id: str) -> Optional[Any]:
+        record = self.rows.get(id)
+        if record is None:
+            return None
+        self.check_unreferenced(id)
+        self.ids = None
+        del self.rows[id]
+        self._unindex(record)
+        return record
+
+    def scan(self, after: Optional[str], limit: int) -> List[Any]:
+        """
+        Returns up to limit records ordered by identifier, starting after the identifier after.
+
+        The sorted identifiers are kept until the next insert or delete, so a full scan sorts them once.
+        """
+        if self.ids is None:
+            self.ids = sorted(self.rows)
+        start = 0 if after is None else bisect.bisect_right(self.ids, after)
+        return [self.rows[id] for id in self.ids[start : start + limit]]
+
+    def children_of(self, parent_id: str) -> List[Any]:
+        siblings = self.children.get(parent_id, ())
+        if self.sort_key is None:
+            return [self.rows[id] for id in siblings]
+        return [self.rows[key[-1]] for key in siblings]
+
+
+def _save_key(game_state: GameStateRecord) -> Tuple[datetime, str]:
+    return (game_state.updatedAt, game_state.id)
+
+
+class MemoryDatabase:
+    """
+    Every table of the in-memory backend, with their foreign keys.
+    """
+
+    def __init__(self):
+        self.users = MemoryTable("User", UserRecord)
+        self.users_by_email: Dict[str, str] = {}
+        self.game_states = MemoryTable(
+            "GameState", GameStateRecord, "userId", self.users, _save_key
+        )
+        self.maps = MemoryTable(
+            "ProjectMap", ProjectMapRecord, "gameStateId", self.game_states
+        )
+        self.items = MemoryTable("Item", ItemRecord, "projectMapId", self.maps)
+        self.npcs = MemoryTable("NPC", NpcRecord, "projectMapId", self.maps)
+        self.jobs = MemoryTable("Job", JobRecord)
+        self.tables = [
+            self.users,
+            self.game_states,
+            self.maps,
+            self.items,
+            self.npcs,
+            self.jobs,
+        ]
+
+    def insert_user(self, data: Dict[str, Any]) -> UserRecord:
+        if data.get("email") in self.users_by_email:
+            raise ValueError(f"User with email '{data['email']}' already exists.")
+        user = self.users.insert(data)
+        self.users_by_email[user.email] = user.id
+        return user
+
+    def with_contents(
+        self, project_map: ProjectMapRecord, items: bool, npcs: bool
+    ) -> ProjectMapRecord:
+        update = {}
+        if items:
+            update["Items"] = self.items.children_of(project_map.id)
+        if npcs:
+            update["NPCs"] = self.npcs.children_of(project_map.id)
+        return project_map.model_copy(update=update) if update else project_map
+
+    def with_maps(self, game_state: GameStateRecord, contents: bool) -> GameStateRecord:
+        return game_state.model_copy(
+            update={
+                "Maps": [
+                    self.with_contents(project_map, contents, contents)
+                    for project_map in self.maps.children_of(game_state.id)
+                ]
+            }
+        )
+
+    def dump(self) -> Dict[str, List[Dict[str, Any]]]:
+        return {
+            table.name: [
+                record.model_dump(mode="json") for record in table.rows.values()
+            ]
+            for table in self.tables
+        }
+
+    def load(self, snapshot: Dict[str, List[Dict[str, Any]]]) -> None:
+        for data in snapshot.get(self.users.name, []):
+            self.insert_user(data)
+        for table in self.tables[1:]:
+            for data in snapshot.get(table.name, []):
+                table.insert(data)
+
+
+class MemoryUserRepository(UserRepository):
+    def __init__(self, db: MemoryDatabase):
+        self.db = db
+
+    async def find(self, id: str) -> Optional[UserRecord]:
+        return self.db.users.rows.get(id)
+
+    async def find_by_email(self, email: str) -> Optional[UserRecord]:
+        id = self.db.users_by_email.get(email)
+        return None if id is None else self.db.users.rows[id]
+
+    async def create(self, data: Dict[str, Any]) -> UserRecord:
+        return self.db.insert_user(data)
+
+
+class MemoryGameStateRepository(GameStateRepository):
+    def __init__(self, db: MemoryDatabase):
+        self.db = db
+
+    async def find(
+        self, id: str, include_maps: bool = False, include_map_contents: bool = False
+    ) -> Optional[GameStateRecord]:
+        game_state = self.db.game_states.rows.get(id)
+        if game_state is not None and (include_maps or include_map_contents):
+            game_state = self.db.with_maps(game_state, include_map_contents)
+        return game_state
+
+    async def find_many(
+        self, ids: List[str], include_maps: bool = False
+    ) -> List[GameStateRecord]:
+        game_states = [
+            self.db.game_states.rows[id]
+            for id in dict.fromkeys(ids)
+            if id in self.db.game_states.rows
+        ]
+        if include_maps:
+            game_states = [
+                self.db.with_maps(game_state, False) for game_state in game_states
+            ]
+        return game_states
+
+    async def create(self, data: Dict[str, Any]) -> GameStateRecord:
+        return self.db.game_states.insert(data)
+
+    async def list_page(
+        self, userId: str, before: Optional[Tuple[datetime, str]], limit: int
+    ) -> List[GameStateRecord]:
+        keys = self.db.game_states.children.get(userId, [])
+        end = (
+            len(keys)
+            if before is None
+            else bisect.bisect_left(keys, (_utc(before[0]), before[1]))
+        )
+        return [
+            self.db.game_states.rows[id].model_copy(update={"data": None})
+            for _, id in reversed(keys[max(0, end - limit) : end])
+        ]
+
+    async def list_user_ids(self, after: Optional[str], limit: int) -> List[str]:
+        user_ids = sorted(self.db.game_states.children)
+        start = 0 if after is None else bisect.bisect_right(user_ids, after)
+        return user_ids[start : start + limit]
+
+    async def list_retention_candidates(self, userId: str) -> List[Dict[str, Any]]:
+        return [
+            {
+                "id": id,
+                "updatedAt": updated_at.isoformat(),
+                "hasMaps": id in self.db.maps.children,
+            }
+            for updated_at, id in reversed(self.db.game_states.children.get(userId, []))
+        ]
+
+    async def delete_many(self, ids: List[str]) -> int:
+        ids = [id for id in dict.fromkeys(ids) if id in self.db.game_states.rows]
+        for id in ids:
+            self.db.game_states.check_unreferenced(id)
+        for id in ids:
+            self.db.game_states.delete(id)
+        return len(ids)
+
+
+class MemoryMapRepository(MapRepository):
+    def __init__(self, db: MemoryDatabase):
+        self.db = db
+
+    async def find(
+        self, id: str, include_items: bool = False, include_npcs: bool = False
+    ) -> Optional[ProjectMapRecord]:
+        project_map = self.db.maps.rows.get(id)
+        if project_map is not None:
+            project_map = self.db.with_contents(
+                project_map, include_items, include_npcs
+            )
+        return project_map
+
+    async def create(self, data: Dict[str, Any]) -> ProjectMapRecord:
+        return self.db.maps.insert(data)
+
+    async def update(self, id: str, data: Dict[str, Any]) -> Optional[ProjectMapRecord]:
+        return self.db.maps.update(id, data)
+
+
+class MemoryItemRepository(ItemRepository):
+    def __init__(self, db: MemoryDatabase):
+        self.db = db
+
+    async def find(self, id: str) -> Optional[ItemRecord]:
+        return self.db.items.rows.get(id)
+
+    async def create(self, data: Dict[str, Any]) -> ItemRecord:
+        return self.db.items.insert(data)
+
+    async def create_many(self, data: List[Dict[str, Any]]) -> int:
+        return len(self.db.items.insert_many(data))
+
+    async def update(self, id: str, data: Dict[str, Any]) -> Optional[ItemRecord]:
+        return self.db.items.update(id, data)
+
+    async def delete(self, id: str) -> Optional[ItemRecord]:
+        return self.db.items.delete(id)
+
+
+class MemoryNpcRepository(NpcRepository):
+    def __init__(self, db: MemoryDatabase):
+        self.db = db
+
+    async def find(self, id: str) -> Optional[NpcRecord]:
+        return self.db.npcs.rows.get(id)
+
+    async def create(self, data: Dict[str, Any]) -> NpcRecord:
+        return self.db.npcs.insert(data)
+
+    async def update(self, id: str, data: Dict[str, Any]) -> Optional[NpcRecord]:
+        return self.db.npcs.update(id, data)
+
+    async def update_batch(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        missing = [id for id in updates if id not in self.db.npcs.rows]
+        if missing:
+            raise ValueError(f"NPC '{missing[0]}' does not exist.")
+        for id, data in updates.items():
+            self.db.npcs.update(id, data)
+
+    async def delete(self, id: str) -> Optional[NpcRecord]:
+        return self.db.npcs.delete(id)
+
+
+class MemoryJobRepository(JobRepository):
+    def __init__(self, db: MemoryDatabase):
+        self.db = db
+
+    async def find(self, id: str) -> Optional[JobRecord]:
+        return self.db.jobs.rows.get(id)
+
+    async def create(self, data: Dict[str, Any]) -> JobRecord:
+        return self.db.jobs.insert(data)
+
+    async def transition(
+        self, id: str, statuses: List[str], data: Dict[str, Any]
+    ) -> Optional[JobRecord]:
+        job = self.db.jobs.rows.get(id)
+        if job is None or job.status not in statuses:
+            return None
+        return self.db.jobs.update(id, data)
+
+    async def list_queued(self, limit: int) -> List[str]:
+        queued = [job for job in self.db.jobs.rows.values() if job.status == "queued"]
+        queued.sort(key=lambda job: job.createdAt)
+        return [job.id for job in queued[:limit]]
+
+    async def requeue_stale(self, before: datetime) -> int:
+        stale = [
+            job.id
+            for job in self.db.jobs.rows.values()
+            if job.status == "running" and job.updatedAt < _utc(before)
+        ]
+        for id in stale:
+            self.db.jobs.update(id, {"status": "queued"})
+        return len(stale)
+
+    async def delete_expired(self, now: datetime) -> int:
+        expired = [
+            job.id
+            for job in self.db.jobs.rows.values()
+            if job.expiresAt is not None and job.expiresAt < _utc(now)
+        ]
+        for id in expired:
+            self.db.jobs.delete(id)
+        return len(expired)
+
+
+class MemoryBulkRepository(BulkRepository):
+    def __init__(self, db: MemoryDatabase):
+        self.db = db
+
+    def _table(self, table: str) -> MemoryTable:
+        return {
+            "GameState": self.db.game_states,
+            "ProjectMap": self.db.maps,
+            "Item": self.db.items,
+            "NPC": self.db.npcs,
+        }[table]
+
+    async def scan(self, table: str, after: Optional[str], limit: int) -> List[Any]:
+        return self._table(table).scan(after, limit)
+
+    async def insert_many(self, table: str, rows: List[Dict[str, Any]]) -> int:
+        return len(self._table(table).insert_many(rows))
+
+
+def _write_snapshot(snapshot: Dict[str, List[Dict[str, Any]]], path: str) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=1) as f:
+                f.write(json.dumps(snapshot).encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class MemoryStorage(Storage):
+    """
+    Keeps every record in dicts inside the process, for single-node, ephemeral and load-testing deployments.
+
+    Records are indexed by identifier and by parent, and the saves of every user are kept sorted by (updatedAt, id)
+    so listings are served by bisection. When STORAGE_SNAPSHOT_PATH is set, the records are loaded from that gzip
+    compressed JSON snapshot on connect and written back to it on disconnect and every STORAGE_SNAPSHOT_INTERVAL
+    seconds (60 by default, 0 to only write on disconnect). The records live in one process, so the app must run
+    with a single worker.
+    """
+
+    def __init__(self):
+        self.db = MemoryDatabase()
+        self.users = MemoryUserRepository(self.db)
+        self.game_states = MemoryGameStateRepository(self.db)
+        self.maps = MemoryMapRepository(self.db)
+        self.items = MemoryItemRepository(self.db)
+        self.npcs = MemoryNpcRepository(self.db)
+        self.jobs = MemoryJobRepository(self.db)
+        self.bulk = MemoryBulkRepository(self.db)
+        self.snapshot_task: Optional[asyncio.Task] = None
+
+    async def connect(self) -> None:
+        if not STORAGE_SNAPSHOT_PATH:
+            return
+        if os.path.exists(STORAGE_SNAPSHOT_PATH):
+            with gzip.open(STORAGE_SNAPSHOT_PATH, "rb") as f:
+                self.db.load(json.loads(f.read()))
+        if STORAGE_SNAPSHOT_INTERVAL > 0:
+            self.snapshot_task = asyncio.create_task(self._snapshot_periodically())
+
+    async def snapshot(self) -> None:
+        """
+        Writes all records to STORAGE_SNAPSHOT_PATH, replacing the previous snapshot atomically.
+        """
+        await asyncio.to_thread(_write_snapshot, self.db.dump(), STORAGE_SNAPSHOT_PATH)
+
+    async def _snapshot_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(STORAGE_SNAPSHOT_INTERVAL)
+            try:
+                await self.snapshot()
+            except Exception:
+                logger.exception("Error writing storage snapshot")
+
+    async def disconnect(self) -> None:
+        if self.snapshot_task is not None:
+            self.snapshot_task.cancel()
+            self.snapshot_task = None
+        if STORAGE_SNAPSHOT_PATH:
+            await self.snapshot()
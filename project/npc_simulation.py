@@ -0,0 +1,153 @@
+import json
+from typing import Any, List, Optional
+
+import numpy as np
+import project.map_grid
+
+STEP_X = np.array([1, 0, -1, 0], dtype=np.int32)
+STEP_Y = np.array([0, 1, 0, -1], dtype=np.int32)
+TURN_PROBABILITY = 0.1
+
+
+class NpcSimulation:
+    """
+    The NPCs of one map in struct-of-arrays form: one array per field, indexed by NPC.
+
+    Every NPC keeps its position in attributes["position"] ({"x", "y"}) and its heading in attributes["direction"]
+    (0 east, 1 south, 2 west, 3 north). NPCs with attributes["movement"] set to "static" never move; all others
+    wander, keeping their heading until they are blocked or randomly turn.
+    """
+
+    def __init__(self, grid: np.ndarray, npcs: List[Any], seed: Optional[int] = None):
+        self.grid = grid
+        self.walkable = project.map_grid.WALKABLE[grid]
+        self.rng = np.random.default_rng(seed)
+        self.ids = [npc.id for npc in npcs]
+        self.attributes = [
+            (
+                json.loads(npc.attributes)
+                if isinstance(npc.attributes, str)
+                else dict(npc.attributes or {})
+            )
+            for npc in npcs
+        ]
+        count = len(npcs)
+        self.x = np.full(count, -1, dtype=np.int32)
+        self.y = np.full(count, -1, dtype=np.int32)
+        self.direction = self.rng.integers(0, 4, size=count, dtype=np.int8)
+        self.mobile = np.ones(count, dtype=bool)
+        for index, attributes in enumerate(self.attributes):
+            position = attributes.get("position")
+            if isinstance(position, dict):
+                self.x[index] = position.get("x", -1)
+                self.y[index] = position.get("y", -1)
+            if attributes.get("direction") in (0, 1, 2, 3):
+                self.direction[index] = attributes["direction"]
+            self.mobile[index] = attributes.get("movement") != "static"
+        self.initial = (self.x.copy(), self.y.copy(), self.direction.copy())
+        self.occupied = np.zeros(grid.size, dtype=bool)
+        self.claimant = np.zeros(grid.size, dtype=np.int64)
+        self._spawn_unplaced()
+
+    def _cell_index(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        return y.astype(np.int64) * self.grid.shape[1] + x
+
+    def _spawn_unplaced(self) -> None:
+        height, width = self.grid.shape
+        inside = (self.x >= 0) & (self.x < width) & (self.y >= 0) & (self.y < height)
+        unplaced = np.flatnonzero(~inside)
+        if not unplaced.size:
+            return
+        free = self.walkable.ravel().copy()
+        free[self._cell_index(self.x[inside], self.y[inside])] = False
+        candidates = np.flatnonzero(free)
+        chosen = self.rng.choice(
+            candidates, size=min(unplaced.size, candidates.size), replace=False
+        )
+        self.y[unplaced[: chosen.size]], self.x[unplaced[: chosen.size]] = np.divmod(
+            chosen, width
+        )
+
+    def tick(self) -> None:
+        """
+        Advances every NPC by one step.
+
+        Each mobile NPC tries to step one cell along its heading. Steps off the map or onto cells that are not walkable
+        are blocked and make the NPC pick a new heading. Steps onto a cell held by an NPC that stays put, or claimed
+        by another NPC earlier in the arrays, are blocked too. Claims are resolved on flat cell indices: a minimum
+        scatter into a per-cell claimant array keeps the first claim of every cell, and an occupancy grid of the NPCs
+        that stay put blocks steps onto their cells, growing with each blocked NPC until no step is blocked.
+        """
+        height, width = self.grid.shape
+        count = self.x.size
+        turning = self.rng.random(count) < TURN_PROBABILITY
+        self.direction[turning] = self.rng.integers(
+            0, 4, size=int(turning.sum()), dtype=np.int8
+        )
+        target_x = self.x + STEP_X[self.direction]
+        target_y = self.y + STEP_Y[self.direction]
+        moving = (
+            self.mobile
+            & (self.x >= 0)
+            & (target_x >= 0)
+            & (target_x < width)
+            & (target_y >= 0)
+            & (target_y < height)
+        )
+        moving[moving] = self.walkable[target_y[moving], target_x[moving]]
+        blocked = self.mobile & ~moving
+        self.direction[blocked] = self.rng.integers(
+            0, 4, size=int(blocked.sum()), dtype=np.int8
+        )
+        current = self._cell_index(self.x, self.y)
+        target = self._cell_index(target_x, target_y)
+        movers = np.flatnonzero(moving)
+        self.claimant[target[movers]] = count
+        np.minimum.at(self.claimant, target[movers], movers)
+        claimed = self.claimant[target[movers]] != movers
+        moving[movers[claimed]] = False
+        self.occupied.fill(False)
+        self.occupied[current[(self.x >= 0) & ~moving]] = True
+        movers = movers[~claimed]
+        while True:
+            held = self.occupied[target[movers]]
+            losers = movers[held]
+            if not losers.size:
+                break
+            moving[losers] = False
+            self.occupied[current[losers]] = True
+            movers = movers[~held]
+        self.x[moving] = target_x[moving]
+        self.y[moving] = target_y[moving]
+
+    def changed(self) -> np.ndarray:
+        """
+        Returns the indexes of the NPCs whose position or heading differs from the stored attributes.
+
+        NPCs that could not be spawned because the map had no free walkable cell left have no position and are never
+        included.
+
+        Returns:
+            np.ndarray: The indexes of the changed NPCs.
+        """
+        x, y, direction = self.initial
+        return np.flatnonzero(
+            (self.x >= 0)
+            & ((self.x != x) | (self.y != y) | (self.direction != direction))
+        )
+
+    def attributes_of(self, index: int) -> dict:
+        """
+        Returns the attributes of an NPC with its simulated position and heading written in.
+
+        Args:
+            index (int): The index of the NPC.
+
+        Returns:
+            dict: The updated attributes.
+        """
+        return {
+            **self.attributes[index],
+            "position": {"x": int(self.x[index]), "y": int(self.y[index])},
+            "direction": int(self.direction[index]),
+        }
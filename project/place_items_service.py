@@ -0,0 +1,160 @@
+import json
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import project.item_placement
+import project.storage
+from pydantic import BaseModel
+
+
+class ItemPlacementRequest(BaseModel):
+    """
+    An item to create on a map, placed on a random cell that satisfies its placement constraints.
+    """
+
+    name: str
+    description: Optional[str] = None
+    appearance: str = ""
+    effects: Dict[str, Any] = {}
+    placementConstraints: Dict[str, Any] = {}
+
+
+class PlacedItem(BaseModel):
+    """
+    The cell an item of the request was placed on, identified by its index in the request.
+    """
+
+    index: int
+    x: int
+    y: int
+
+
+class PlaceItemsResponse(BaseModel):
+    """
+    Reports where the requested items were placed and which of them could not be placed because no free cell satisfied their constraints.
+    """
+
+    placedCount: int
+    placements: List[PlacedItem]
+    unplaced: List[int]
+
+
+class ItemPlacementValidationResponse(BaseModel):
+    """
+    Reports which items of a map are placed on cells that do not satisfy their placement constraints.
+    """
+
+    checkedCount: int
+    invalidItemIds: List[str]
+
+
+async def place_items(
+    projectMapId: str, items: List[ItemPlacementRequest], seed: Optional[int] = None
+) -> PlaceItemsResponse:
+    """
+    Creates many items on a map at once, placing each on a free cell that satisfies its placement constraints.
+
+    Args:
+        projectMapId (str): The unique identifier of the map to place the items on.
+        items (List[ItemPlacementRequest]): The items to create.
+        seed (Optional[int]): Seed for the random choice of cells, for reproducible placements.
+
+    Returns:
+        PlaceItemsResponse: Reports where the requested items were placed and which of them could not be placed because no free cell satisfied their constraints.
+
+    The constraints are compiled into boolean masks over the grid, one per distinct set of constraints, and all
+    placed items are written with a single create_many.
+    """
+    storage = project.storage.get_storage()
+    project_map = await storage.maps.find(projectMapId, include_items=True)
+    if project_map is None:
+        raise ValueError(f"ProjectMap with ID {projectMapId} does not exist.")
+    constraint_sets = [
+        project.item_placement.parse_constraints(item.placementConstraints)
+        for item in items
+    ]
+    context = project.item_placement.PlacementContext(project_map)
+    positions = context.place(
+        constraint_sets,
+        project.item_placement.occupied_mask(
+            project_map.Items or [], context.grid.shape
+        ),
+        seed,
+    )
+    placed = np.flatnonzero(positions[:, 0] >= 0)
+    placements = [
+        PlacedItem(
+            index=int(index), x=int(positions[index, 0]), y=int(positions[index, 1])
+        )
+        for index in placed
+    ]
+    if placements:
+        await storage.items.create_many(
+            [
+                {
+                    "name": items[placement.index].name,
+                    "description": items[placement.index].description,
+                    "projectMapId": projectMapId,
+                    "metaData": json.dumps(
+                        {
+                            "effects": items[placement.index].effects,
+                            "appearance": items[placement.index].appearance,
+                            "placementConstraints": constraint_sets[placement.index],
+                            "position": {"x": placement.x, "y": placement.y},
+                        }
+                    ),
+                }
+                for placement in placements
+            ]
+        )
+    return PlaceItemsResponse(
+        placedCount=len(placements),
+        placements=placements,
+        unplaced=[int(index) for index in np.flatnonzero(positions[:, 0] < 0)],
+    )
+
+
+async def validate_item_placements(
+    projectMapId: str,
+) -> ItemPlacementValidationResponse:
+    """
+    Checks the position of every placed item of a map against its placement constraints.
+
+    Args:
+        projectMapId (str): The unique identifier of the map whose items are checked.
+
+    Returns:
+        ItemPlacementValidationResponse: Reports which items of a map are placed on cells that do not satisfy their placement constraints.
+    """
+    project_map = await project.storage.get_storage().maps.find(
+        projectMapId, include_items=True
+    )
+    if project_map is None:
+        raise ValueError(f"ProjectMap with ID {projectMapId} does not exist.")
+    items = []
+    constraint_sets = []
+    positions = []
+    for item in project_map.Items or []:
+        metaData = (
+            json.loads(item.metaData)
+            if isinstance(item.metaData, str)
+            else item.metaData
+        )
+        position = project.item_placement.item_position(metaData)
+        if not position:
+            continue
+        items.append(item)
+        constraint_sets.append(
+            project.item_placement.parse_constraints(
+                metaData.get("placementConstraints")
+            )
+        )
+        positions.append([position["x"], position["y"]])
+    context = project.item_placement.PlacementContext(project_map)
+    valid = context.validate(
+        constraint_sets, np.array(positions, dtype=np.int64).reshape(-1, 2)
+    )
+    return ItemPlacementValidationResponse(
+        checkedCount=len(items),
+        invalidItemIds=[item.id for item, ok in zip(items, valid) if not ok],
+    )
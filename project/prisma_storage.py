@@ -0,0 +1,326 @@
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar
+
+import prisma
+import prisma.models
+from project.storage import (
+    BulkRepository,
+    GameStateRecord,
+    GameStateRepository,
+    ItemRecord,
+    ItemRepository,
+    JobRecord,
+    JobRepository,
+    MapRepository,
+    NpcRecord,
+    NpcRepository,
+    ProjectMapRecord,
+    Storage,
+    UserRecord,
+    UserRepository,
+)
+from pydantic import BaseModel
+
+Record = TypeVar("Record", bound=BaseModel)
+
+JSON_FIELDS = {
+    "GameState": ["data"],
+    "ProjectMap": ["cells"],
+    "Item": ["metaData"],
+    "NPC": ["attributes"],
+    "Job": ["params", "result"],
+}
+
+
+def _record(model: Type[Record], row: Any) -> Optional[Record]:
+    return None if row is None else model.model_validate(row, from_attributes=True)
+
+
+def _json_data(table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    # Prisma takes Json columns as JSON text; values already serialized by the caller are passed through.
+    return {
+        **data,
+        **{
+            field: json.dumps(data[field])
+            for field in JSON_FIELDS[table]
+            if field in data
+            and data[field] is not None
+            and not isinstance(data[field], str)
+        },
+    }
+
+
+class PrismaUserRepository(UserRepository):
+    async def find(self, id: str) -> Optional[UserRecord]:
+        return _record(
+            UserRecord, await prisma.models.User.prisma().find_unique(where={"id": id})
+        )
+
+    async def find_by_email(self, email: str) -> Optional[UserRecord]:
+        return _record(
+            UserRecord,
+            await prisma.models.User.prisma().find_unique(where={"email": email}),
+        )
+
+    async def create(self, data: Dict[str, Any]) -> UserRecord:
+        return _record(UserRecord, await prisma.models.User.prisma().create(data=data))
+
+
+class PrismaGameStateRepository(GameStateRepository):
+    async def find(
+        self, id: str, include_maps: bool = False, include_map_contents: bool = False
+    ) -> Optional[GameStateRecord]:
+        include = None
+        if include_map_contents:
+            include = {"Maps": {"include": {"Items": True, "NPCs": True}}}
+        elif include_maps:
+            include = {"Maps": True}
+        return _record(
+            GameStateRecord,
+            await prisma.models.GameState.prisma().find_unique(
+                where={"id": id}, include=include
+            ),
+        )
+
+    async def find_many(
+        self, ids: List[str], include_maps: bool = False
+    ) -> List[GameStateRecord]:
+        game_states = await prisma.models.GameState.prisma().find_many(
+            where={"id": {"in": ids}}, include={"Maps": True} if include_maps else None
+        )
+        return [_record(GameStateRecord, game_state) for game_state in game_states]
+
+    async def create(self, data: Dict[str, Any]) -> GameStateRecord:
+        return _record(
+            GameStateRecord,
+            await prisma.models.GameState.prisma().create(
+                data=_json_data("GameState", data)
+            ),
+        )
+
+    async def list_page(
+        self, userId: str, before: Optional[Tuple[datetime, str]], limit: int
+    ) -> List[GameStateRecord]:
+        if before is None:
+            rows = await prisma.get_client().query_raw(
+                'SELECT "id", "createdAt", "updatedAt" FROM "GameState" '
+                'WHERE "userId" = $1 '
+                'ORDER BY "updatedAt" DESC, "id" DESC LIMIT $2',
+                userId,
+                limit,
+            )
+        else:
+            rows = await prisma.get_client().query_raw(
+                'SELECT "id", "createdAt", "updatedAt" FROM "GameState" '
+                'WHERE "userId" = $1 AND ("updatedAt", "id") < ($2::timestamp(3), $3) '
+                'ORDER BY "updatedAt" DESC, "id" DESC LIMIT $4',
+                userId,
+                before[0].isoformat(),
+                before[1],
+                limit,
+            )
+        return [GameStateRecord(userId=userId, **row) for row in rows]
+
+    async def list_user_ids(self, after: Optional[str], limit: int) -> List[str]:
+        rows = await prisma.get_client().query_raw(
+            'SELECT DISTINCT "userId" FROM "GameState" '
+            'WHERE $1::text IS NULL OR "userId" > $1 '
+            'ORDER BY "userId" LIMIT $2',
+            after,
+            limit,
+        )
+        return [row["userId"] for row in rows]
+
+    async def list_retention_candidates(self, userId: str) -> List[Dict[str, Any]]:
+        return await prisma.get_client().query_raw(
+            'SELECT gs."id", gs."updatedAt", EXISTS ('
+            'SELECT 1 FROM "ProjectMap" pm WHERE pm."gameStateId" = gs."id"'
+            ') AS "hasMaps" FROM "GameState" gs WHERE gs."userId" = $1 '
+            'ORDER BY gs."updatedAt" DESC, gs."id" DESC',
+            userId,
+        )
+
+    async def delete_many(self, ids: List[str]) -> int:
+        return await prisma.models.GameState.prisma().delete_many(
+            where={"id": {"in": ids}}
+        )
+
+
+class PrismaMapRepository(MapRepository):
+    async def find(
+        self, id: str, include_items: bool = False, include_npcs: bool = False
+    ) -> Optional[ProjectMapRecord]:
+        include = {"Items": include_items, "NPCs": include_npcs}
+        return _record(
+            ProjectMapRecord,
+            await prisma.models.ProjectMap.prisma().find_unique(
+                where={"id": id},
+                include=include if include_items or include_npcs else None,
+            ),
+        )
+
+    async def create(self, data: Dict[str, Any]) -> ProjectMapRecord:
+        return _record(
+            ProjectMapRecord,
+            await prisma.models.ProjectMap.prisma().create(
+                data=_json_data("ProjectMap", data)
+            ),
+        )
+
+    async def update(self, id: str, data: Dict[str, Any]) -> Optional[ProjectMapRecord]:
+        return _record(
+            ProjectMapRecord,
+            await prisma.models.ProjectMap.prisma().update(
+                where={"id": id}, data=_json_data("ProjectMap", data)
+            ),
+        )
+
+
+class PrismaItemRepository(ItemRepository):
+    async def find(self, id: str) -> Optional[ItemRecord]:
+        return _record(
+            ItemRecord, await prisma.models.Item.prisma().find_unique(where={"id": id})
+        )
+
+    async def create(self, data: Dict[str, Any]) -> ItemRecord:
+        return _record(
+            ItemRecord,
+            await prisma.models.Item.prisma().create(data=_json_data("Item", data)),
+        )
+
+    async def create_many(self, data: List[Dict[str, Any]]) -> int:
+        return await prisma.models.Item.prisma().create_many(
+            data=[_json_data("Item", row) for row in data]
+        )
+
+    async def update(self, id: str, data: Dict[str, Any]) -> Optional[ItemRecord]:
+        return _record(
+            ItemRecord,
+            await prisma.models.Item.prisma().update(
+                where={"id": id}, data=_json_data("Item", data)
+            ),
+        )
+
+    async def delete(self, id: str) -> Optional[ItemRecord]:
+        return _record(
+            ItemRecord, await prisma.models.Item.prisma().delete(where={"id": id})
+        )
+
+
+class PrismaNpcRepository(NpcRepository):
+    async def find(self, id: str) -> Optional[NpcRecord]:
+        return _record(
+            NpcRecord, await prisma.models.NPC.prisma().find_unique(where={"id": id})
+        )
+
+    async def create(self, data: Dict[str, Any]) -> NpcRecord:
+        return _record(
+            NpcRecord,
+            await prisma.models.NPC.prisma().create(data=_json_data("NPC", data)),
+        )
+
+    async def update(self, id: str, data: Dict[str, Any]) -> Optional[NpcRecord]:
+        return _record(
+            NpcRecord,
+            await prisma.models.NPC.prisma().update(
+                where={"id": id}, data=_json_data("NPC", data)
+            ),
+        )
+
+    async def update_batch(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        async with prisma.get_client().batch_() as batcher:
+            for id, data in updates.items():
+                batcher.npc.update(where={"id": id}, data=_json_data("NPC", data))
+
+    async def delete(self, id: str) -> Optional[NpcRecord]:
+        return _record(
+            NpcRecord, await prisma.models.NPC.prisma().delete(where={"id": id})
+        )
+
+
+class PrismaJobRepository(JobRepository):
+    async def find(self, id: str) -> Optional[JobRecord]:
+        return _record(
+            JobRecord, await prisma.models.Job.prisma().find_unique(where={"id": id})
+        )
+
+    async def create(self, data: Dict[str, Any]) -> JobRecord:
+        return _record(
+            JobRecord,
+            await prisma.models.Job.prisma().create(data=_json_data("Job", data)),
+        )
+
+    async def transition(
+        self, id: str, statuses: List[str], data: Dict[str, Any]
+    ) -> Optional[JobRecord]:
+        updated = await prisma.models.Job.prisma().update_many(
+            where={"id": id, "status": {"in": statuses}}, data=_json_data("Job", data)
+        )
+        return await self.find(id) if updated else None
+
+    async def list_queued(self, limit: int) -> List[str]:
+        jobs = await prisma.models.Job.prisma().find_many(
+            where={"status": "queued"}, order={"createdAt": "asc"}, take=limit
+        )
+        return [job.id for job in jobs]
+
+    async def requeue_stale(self, before: datetime) -> int:
+        return await prisma.models.Job.prisma().update_many(
+            where={"status": "running", "updatedAt": {"lt": before}},
+            data={"status": "queued"},
+        )
+
+    async def delete_expired(self, now: datetime) -> int:
+        return await prisma.models.Job.prisma().delete_many(
+            where={"expiresAt": {"lt": now}}
+        )
+
+
+BULK_MODELS = {
+    "GameState": GameStateRecord,
+    "ProjectMap": ProjectMapRecord,
+    "Item": ItemRecord,
+    "NPC": NpcRecord,
+}
+
+
+class PrismaBulkRepository(BulkRepository):
+    async def scan(self, table: str, after: Optional[str], limit: int) -> List[Any]:
+        rows = (
+            await getattr(prisma.models, table)
+            .prisma()
+            .find_many(
+                where={"id": {"gt": after}} if after is not None else None,
+                order={"id": "asc"},
+                take=limit,
+            )
+        )
+        return [_record(BULK_MODELS[table], row) for row in rows]
+
+    async def insert_many(self, table: str, rows: List[Dict[str, Any]]) -> int:
+        rows = [_json_data(table, row) for row in rows]
+        async with prisma.get_client().tx() as transaction:
+            return await getattr(transaction, table.lower()).create_many(data=rows)
+
+
+class PrismaStorage(Storage):
+    """
+    Stores records in Postgres through the Prisma client, converting the rows it returns into storage records.
+    """
+
+    def __init__(self):
+        self.client = prisma.Prisma(auto_register=True)
+        self.users = PrismaUserRepository()
+        self.game_states = PrismaGameStateRepository()
+        self.maps = PrismaMapRepository()
+        self.items = PrismaItemRepository()
+        self.npcs = PrismaNpcRepository()
+        self.jobs = PrismaJobRepository()
+        self.bulk = PrismaBulkRepository()
+
+    async def connect(self) -> None:
+        await self.client.connect()
+
+    async def disconnect(self) -> None:
+        await self.client.disconnect()
@@ -1,8 +1,7 @@
 from typing import Optional
 
 import bcrypt
-import prisma
-import prisma.models
+import project.storage
 from pydantic import BaseModel
 
 
@@ -28,16 +27,15 @@ async def register_user(email: str, password: str) -> RegisterUserResponse:
     RegisterUserResponse: Response model indicating the result of the user registration attempt. It will return a success status and either a user ID for successful registrations or error details for failures.
     """
     try:
-        existing_user = await prisma.models.User.prisma().find_unique(
-            where={"email": email}
-        )
+        storage = project.storage.get_storage()
+        existing_user = await storage.users.find_by_email(email)
         if existing_user:
             return RegisterUserResponse(
                 success=False, error_message="Email already in use."
             )
         hashed_password = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
-        user = await prisma.models.User.prisma().create(
-            data={"email": email, "password": hashed_password.decode("utf-8")}
+        user = await storage.users.create(
+            {"email": email, "password": hashed_password.decode("utf-8")}
         )
         return RegisterUserResponse(success=True, user_id=user.id)
     except Exception as e:
@@ -1,5 +1,9 @@
-from typing import Dict, List, Optional
+import asyncio
+from typing import Any, Dict, List, Optional
 
+import project.map_grid
+import project.map_validation
+import project.storage
 from pydantic import BaseModel
 
 
@@ -11,10 +15,25 @@ class SaveGameStateResponse(BaseModel):
     success: bool
     message: str
     gameStateId: Optional[str] = None
+    validation: Optional[project.map_validation.MapValidationReport] = None
+    validationError: Optional[str] = None
+
+
+def _validate(mapState: Any) -> project.map_validation.MapValidationReport:
+    grid = project.map_grid.decode_cells(mapState)
+    if grid.size and grid.max() >= project.map_grid.CELL_TYPE_COUNT:
+        raise ValueError(
+            f"Cell types must be between 0 and {project.map_grid.CELL_TYPE_COUNT - 1}."
+        )
+    return project.map_validation.validate_grid(grid)
 
 
 async def save_game(
-    userId: str, mapState: Dict, playerPosition: Dict[str, int], inventory: List[str]
+    userId: str,
+    mapState: Dict,
+    playerPosition: Dict[str, int],
+    inventory: List[str],
+    validate: bool = False,
 ) -> SaveGameStateResponse:
     """
     Saves the current game state for the player, including map and player-specific data.
@@ -24,22 +43,30 @@ async def save_game(
         mapState (Dict): A JSON object representing the current state of the map, including cell types, items, NPCs, and other relevant configurations.
         playerPosition (Dict[str, int]): Coordinates marking the player's current position on the map.
         inventory (List[str]): List of items currently in the player's inventory, captured as a list of item identifiers.
+        validate (bool): Whether to check that the cells of the map state are playable and report the result alongside the save.
 
     Returns:
         SaveGameStateResponse: Provides feedback on the attempt to save the game state, indicating success or the nature of any failure.
+
+    Validation runs in a worker thread. A map state whose cells cannot be decoded into a grid of known cell types is
+    still saved, with the reason it could not be validated in validationError instead of a validation report.
     """
     try:
-        import prisma.models
-
-        user_exists = await prisma.models.User.prisma().find_unique(
-            where={"id": userId}
-        )
+        storage = project.storage.get_storage()
+        user_exists = await storage.users.find(userId)
         if not user_exists:
             return SaveGameStateResponse(
                 success=False, message=f"No user found with ID: {userId}"
             )
-        game_state = await prisma.models.GameState.prisma().create(
-            data={
+        validation = None
+        validation_error = None
+        if validate:
+            try:
+                validation = await asyncio.to_thread(_validate, mapState)
+            except (ValueError, TypeError, OverflowError) as e:
+                validation_error = f"The map state could not be validated: {e}"
+        game_state = await storage.game_states.create(
+            {
                 "userId": userId,
                 "data": {
                     "mapState": mapState,
@@ -53,6 +80,8 @@ async def save_game(
                 success=True,
                 message="Game state saved successfully.",
                 gameStateId=game_state.id,
+                validation=validation,
+                validationError=validation_error,
             )
         else:
             return SaveGameStateResponse(
@@ -1,35 +1,73 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from typing import Any, Dict, List, Optional
 
+import project.admission_control
+import project.batch_render_map_service
+import project.bulk_transfer
+import project.compression
 import project.create_item_service
 import project.create_npc_service
 import project.delete_item_service
 import project.delete_npc_service
+import project.fetch_map_delta_service
+import project.fetch_map_region_service
 import project.fetch_map_service
+import project.fetch_map_tile_service
+import project.game_state_retention
 import project.generate_map_service
+import project.grid_store
+import project.job_queue
+import project.jobs_service
+import project.list_game_states_service
 import project.load_game_service
 import project.login_user_service
 import project.logout_user_service
+import project.map_render
+import project.place_items_service
 import project.register_user_service
 import project.save_game_service
+import project.simulate_npcs_service
+import project.storage
 import project.update_item_service
+import project.update_map_region_service
 import project.update_npc_service
-from fastapi import FastAPI
+import project.wire_format
+from fastapi import FastAPI, Header, Query, Request
 from fastapi.encoders import jsonable_encoder
-from fastapi.responses import Response
-from prisma import Prisma
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
 
 logger = logging.getLogger(__name__)
 
-db_client = Prisma(auto_register=True)
-
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await db_client.connect()
+    storage = project.storage.get_storage()
+    await storage.connect()
+    project.job_queue.job_queue.start()
+    retention_task = None
+    if project.game_state_retention.GAME_STATE_RETENTION_INTERVAL > 0:
+        retention_task = asyncio.create_task(
+            project.game_state_retention.run_periodically()
+        )
+    flush_task = None
+    if project.grid_store.GRID_STORE_BACKEND == "mmap":
+        flush_task = asyncio.create_task(project.grid_store.flush_periodically())
     yield
-    await db_client.disconnect()
+    if retention_task is not None:
+        retention_task.cancel()
+    if flush_task is not None:
+        flush_task.cancel()
+    await project.job_queue.job_queue.stop()
+    project.map_render.shutdown_render_pool()
+    project.grid_store.flush()
+    await storage.disconnect()
 
 
 app = FastAPI(
@@ -38,6 +76,34 @@ app = FastAPI(
     description="To create a simple Python map game with a Flask API that includes a 2D map grid, cells with different values indicating unknown areas, floors, walls, doors, starting points, and endpoints, along with configurable items and NPCs in cells, the recommended tech stack involves Python for programming, Flask as the API framework, and Matplotlib for displaying the map as a PNG file. The game's architecture involves a grid implemented as a list of lists, where each cell's value represents its type (unknown, floor, wall, door, start point, end point). Items within the game would have a base model meta description allowing for customization at instantiation, and although NPCs can exist in any cell, interacting with them would raise a 'NotImplemented' exception. For creating medium and small rooms with corridors of 1 or 2 cells in width, careful design and planning of the grid are required, resembling the layout found in games like Pokémon but accessible through an API. This setup encourages exploring different areas of the map, configuring items, and eventually saving or displaying the map using Matplotlib, which adds a visual component to the game's API.",
 )
 
+app.add_middleware(project.compression.CompressionMiddleware)
+app.add_middleware(project.admission_control.AdmissionControlMiddleware)
+
+
+def grid_response(res, grid_field: str, accept: Optional[str]) -> Response:
+    """
+    Encodes a response holding map cells in the media type negotiated from the Accept header.
+
+    JSON is serialized directly by pydantic rather than through jsonable_encoder, which is much faster for large
+    grids; binary media types are encoded by project.wire_format. Responses without cells, such as maps generated
+    into the grid store, are always sent as JSON.
+    """
+    media_type = project.wire_format.negotiate(
+        accept, project.wire_format.GRID_MEDIA_TYPES
+    )
+    if (
+        media_type == project.wire_format.JSON_MEDIA_TYPE
+        or getattr(res, grid_field) is None
+    ):
+        return Response(
+            content=res.model_dump_json(),
+            media_type=project.wire_format.JSON_MEDIA_TYPE,
+        )
+    return Response(
+        content=project.wire_format.encode_grid_response(res, grid_field, media_type),
+        media_type=media_type,
+    )
+
 
 @app.delete(
     "/item/{itemId}/delete",
@@ -92,13 +158,20 @@ async def api_post_create_item(
     effects: str,
     placementConstraints: str,
     projectMapId: str,
+    place: bool = False,
 ) -> project.create_item_service.CreateItemOutput | Response:
     """
     Create a new item with specified attributes.
     """
     try:
         res = await project.create_item_service.create_item(
-            name, description, appearance, effects, placementConstraints, projectMapId
+            name,
+            description,
+            appearance,
+            effects,
+            placementConstraints,
+            projectMapId,
+            place,
         )
         return res
     except Exception as e:
@@ -137,14 +210,18 @@ async def api_post_register_user(
 
 @app.post("/game/save", response_model=project.save_game_service.SaveGameStateResponse)
 async def api_post_save_game(
-    userId: str, mapState: Dict, playerPosition: Dict[str, int], inventory: List[str]
+    userId: str,
+    mapState: Dict,
+    playerPosition: Dict[str, int],
+    inventory: List[str],
+    validate: bool = False,
 ) -> project.save_game_service.SaveGameStateResponse | Response:
     """
     Saves the current game state for the player, including map and player-specific data.
     """
     try:
         res = await project.save_game_service.save_game(
-            userId, mapState, playerPosition, inventory
+            userId, mapState, playerPosition, inventory, validate
         )
         return res
     except Exception as e:
@@ -283,16 +360,22 @@ async def api_post_create_npc(
     "/map/generate", response_model=project.generate_map_service.GenerateMapResponse
 )
 async def api_post_generate_map(
-    map_size: str, room_sizes: List[str], corridor_width: int
+    gameStateId: str,
+    map_size: str,
+    room_sizes: List[str],
+    corridor_width: int,
+    accept: Optional[str] = Header(None),
 ) -> project.generate_map_service.GenerateMapResponse | Response:
     """
     Generates a new map based on provided configurations or defaults.
+
+    Clients accepting application/octet-stream or msgpack receive the map layout as raw uint8 cells.
     """
     try:
         res = await project.generate_map_service.generate_map(
-            map_size, room_sizes, corridor_width
+            gameStateId, map_size, room_sizes, corridor_width
         )
-        return res
+        return grid_response(res, "map_layout", accept)
     except Exception as e:
         logger.exception("Error processing request")
         res = dict()
@@ -309,14 +392,16 @@ async def api_post_generate_map(
     response_model=project.load_game_service.LoadGameStateResponse,
 )
 async def api_get_load_game(
-    gameStateId: str,
+    gameStateId: str, accept: Optional[str] = Header(None)
 ) -> project.load_game_service.LoadGameStateResponse | Response:
     """
     Loads a previously saved game state.
+
+    Clients accepting application/octet-stream or msgpack receive the map state as raw uint8 cells.
     """
     try:
         res = await project.load_game_service.load_game(gameStateId)
-        return res
+        return grid_response(res, "mapState", accept)
     except Exception as e:
         logger.exception("Error processing request")
         res = dict()
@@ -333,12 +418,22 @@ async def api_get_load_game(
     response_model=project.fetch_map_service.FetchMapResponse,
 )
 async def api_get_fetch_map(
-    gameStateId: str,
+    gameStateId: str, accept: Optional[str] = Header(None)
 ) -> project.fetch_map_service.FetchMapResponse | Response:
     """
     Fetches the current state of the map rendered as a PNG image.
+
+    Clients accepting image/png receive the raw image instead of base64 inside JSON.
     """
     try:
+        if (
+            project.wire_format.negotiate(accept, ["application/json", "image/png"])
+            == "image/png"
+        ):
+            return Response(
+                content=await project.fetch_map_service.fetch_map_png(gameStateId),
+                media_type="image/png",
+            )
         res = await project.fetch_map_service.fetch_map(gameStateId)
         return res
     except Exception as e:
@@ -350,3 +445,391 @@ async def api_get_fetch_map(
             status_code=500,
             media_type="application/json",
         )
+
+
+@app.get(
+    "/map/{projectMapId}/region",
+    response_model=project.fetch_map_region_service.MapRegionResponse,
+)
+async def api_get_fetch_map_region(
+    projectMapId: str, x: int, y: int, width: int, height: int
+) -> project.fetch_map_region_service.MapRegionResponse | Response:
+    """
+    Fetches the cell types of a rectangular region of a map.
+    """
+    try:
+        res = await project.fetch_map_region_service.fetch_map_region(
+            projectMapId, x, y, width, height
+        )
+        return res
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.put(
+    "/map/{projectMapId}/region",
+    response_model=project.update_map_region_service.MapRegionUpdateResponse,
+)
+async def api_put_update_map_region(
+    projectMapId: str, x: int, y: int, cells: List[List[int]]
+) -> project.update_map_region_service.MapRegionUpdateResponse | Response:
+    """
+    Overwrites the cell types of a rectangular region of a map.
+    """
+    try:
+        res = await project.update_map_region_service.update_map_region(
+            projectMapId, x, y, cells
+        )
+        return res
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.get("/map/{gameStateId}/tile/{z}/{x}/{y}", response_class=Response)
+async def api_get_fetch_map_tile(gameStateId: str, z: int, x: int, y: int) -> Response:
+    """
+    Fetches one tile of the map rendered as a PNG image, for zoomable map views.
+    """
+    try:
+        res = await project.fetch_map_tile_service.fetch_map_tile(gameStateId, z, x, y)
+        return Response(content=res, media_type="image/png")
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.post("/map/render/batch", response_class=StreamingResponse)
+async def api_post_batch_render_map(gameStateIds: List[str]) -> Response:
+    """
+    Renders the maps of many game states as PNG images, streamed back as a multipart/mixed response in the order they finish.
+    """
+    try:
+        res = await project.batch_render_map_service.batch_render_map(gameStateIds)
+        media_type, body = project.batch_render_map_service.encode_multipart(res)
+        return StreamingResponse(body, media_type=media_type)
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.get(
+    "/map/{gameStateId}/delta",
+    response_model=project.fetch_map_delta_service.MapDeltaResponse,
+)
+async def api_get_fetch_map_delta(
+    gameStateId: str, baseGameStateId: str
+) -> project.fetch_map_delta_service.MapDeltaResponse | Response:
+    """
+    Fetches the cells that changed since another game state, rendered as small PNG patches with their offsets.
+    """
+    try:
+        res = await project.fetch_map_delta_service.fetch_map_delta(
+            gameStateId, baseGameStateId
+        )
+        return res
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.get(
+    "/game/saves/{userId}",
+    response_model=project.list_game_states_service.ListGameStatesResponse,
+)
+async def api_get_list_game_states(
+    userId: str, cursor: Optional[str] = None, limit: int = 20
+) -> project.list_game_states_service.ListGameStatesResponse | Response:
+    """
+    Lists the saved game states of a user, newest first, one page at a time.
+    """
+    try:
+        res = await project.list_game_states_service.list_game_states(
+            userId, cursor, limit
+        )
+        return res
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.post(
+    "/map/{projectMapId}/items/place",
+    response_model=project.place_items_service.PlaceItemsResponse,
+)
+async def api_post_place_items(
+    projectMapId: str,
+    items: List[project.place_items_service.ItemPlacementRequest],
+    seed: Optional[int] = None,
+) -> project.place_items_service.PlaceItemsResponse | Response:
+    """
+    Create many items on a map, each placed on a free cell that satisfies its placement constraints.
+    """
+    try:
+        res = await project.place_items_service.place_items(projectMapId, items, seed)
+        return res
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.get(
+    "/map/{projectMapId}/items/validate",
+    response_model=project.place_items_service.ItemPlacementValidationResponse,
+)
+async def api_get_validate_item_placements(
+    projectMapId: str,
+) -> project.place_items_service.ItemPlacementValidationResponse | Response:
+    """
+    Check that every placed item of a map satisfies its placement constraints.
+    """
+    try:
+        res = await project.place_items_service.validate_item_placements(projectMapId)
+        return res
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.post(
+    "/map/{projectMapId}/npc/simulate",
+    response_model=project.simulate_npcs_service.SimulateNpcsResponse,
+)
+async def api_post_simulate_npcs(
+    projectMapId: str, ticks: int, seed: Optional[int] = None
+) -> project.simulate_npcs_service.SimulateNpcsResponse | Response:
+    """
+    Advance all NPCs of a map by a number of ticks and store their new positions.
+    """
+    try:
+        res = await project.simulate_npcs_service.simulate_npcs(
+            projectMapId, ticks, seed
+        )
+        return res
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.post(
+    "/jobs/generate",
+    response_model=project.jobs_service.JobResponse,
+    status_code=202,
+)
+async def api_post_submit_generate_job(
+    gameStateId: str, map_size: str, room_sizes: List[str], corridor_width: int
+) -> project.jobs_service.JobResponse | Response:
+    """
+    Queues the generation of a new map and returns the job that will run it.
+    """
+    try:
+        res = await project.jobs_service.submit_generate_job(
+            gameStateId, map_size, room_sizes, corridor_width
+        )
+        return res
+    except project.job_queue.JobQueueFull as e:
+        return JSONResponse(
+            {"error": str(e)}, status_code=503, headers={"Retry-After": "1"}
+        )
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.post(
+    "/jobs/render", response_model=project.jobs_service.JobResponse, status_code=202
+)
+async def api_post_submit_render_job(
+    gameStateId: str,
+) -> project.jobs_service.JobResponse | Response:
+    """
+    Queues the rendering of the map of a game state and returns the job that will run it.
+    """
+    try:
+        res = await project.jobs_service.submit_render_job(gameStateId)
+        return res
+    except project.job_queue.JobQueueFull as e:
+        return JSONResponse(
+            {"error": str(e)}, status_code=503, headers={"Retry-After": "1"}
+        )
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.get("/jobs/{jobId}", response_model=project.jobs_service.JobResponse)
+async def api_get_job(jobId: str) -> project.jobs_service.JobResponse | Response:
+    """
+    Fetches the state of a background job, with its result once it has finished.
+    """
+    try:
+        res = await project.jobs_service.get_job(jobId)
+        return res
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.delete("/jobs/{jobId}", response_model=project.jobs_service.JobResponse)
+async def api_delete_cancel_job(
+    jobId: str,
+) -> project.jobs_service.JobResponse | Response:
+    """
+    Cancels a background job that has not finished yet.
+    """
+    try:
+        res = await project.jobs_service.cancel_job(jobId)
+        return res
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.get("/jobs/{jobId}/events", response_class=StreamingResponse)
+async def api_get_job_events(jobId: str) -> Response:
+    """
+    Streams the state of a background job as server-sent events until it has finished.
+    """
+    try:
+        res = await project.jobs_service.stream_job_events(jobId)
+        return StreamingResponse(
+            res,
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.get("/bulk/export", response_class=StreamingResponse)
+async def api_get_bulk_export(tables: Optional[List[str]] = Query(None)) -> Response:
+    """
+    Streams an NDJSON export of the game states, maps, items and NPCs, or of the given tables only.
+    """
+    try:
+        res = await project.bulk_transfer.export_records(tables)
+        return StreamingResponse(res, media_type="application/x-ndjson")
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.post("/bulk/import", response_model=project.bulk_transfer.ImportSummary)
+async def api_post_bulk_import(
+    request: Request,
+) -> project.bulk_transfer.ImportSummary | Response:
+    """
+    Imports an NDJSON export streamed in the request body, reporting the records created and the rows per second.
+    """
+    try:
+        res = await project.bulk_transfer.import_records(request.stream())
+        return res
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def api_get_metrics() -> PlainTextResponse:
+    """
+    Exposes the admission control counters of this worker in the Prometheus text format.
+    """
+    return PlainTextResponse(project.admission_control.render_metrics())
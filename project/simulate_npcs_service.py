@@ -0,0 +1,87 @@
+import asyncio
+from typing import Any, List, Optional
+
+import numpy as np
+import project.map_cache
+import project.npc_simulation
+import project.storage
+from pydantic import BaseModel
+
+MAX_TICKS = 1000
+
+
+class NpcPosition(BaseModel):
+    """
+    The cell an NPC occupies after the simulation.
+    """
+
+    npcId: str
+    x: int
+    y: int
+
+
+class SimulateNpcsResponse(BaseModel):
+    """
+    Reports the outcome of advancing the NPCs of a map, including how many NPCs were written back and where every NPC ended up.
+    """
+
+    ticks: int
+    npcCount: int
+    updatedCount: int
+    npcs: List[NpcPosition]
+
+
+def _run(
+    grid: np.ndarray, npcs: List[Any], ticks: int, seed: Optional[int]
+) -> project.npc_simulation.NpcSimulation:
+    simulation = project.npc_simulation.NpcSimulation(grid, npcs, seed)
+    for _ in range(ticks):
+        simulation.tick()
+    return simulation
+
+
+async def simulate_npcs(
+    projectMapId: str, ticks: int, seed: Optional[int] = None
+) -> SimulateNpcsResponse:
+    """
+    Advances all NPCs of a map by a number of ticks and stores their new positions.
+
+    Args:
+        projectMapId (str): The unique identifier of the map whose NPCs are simulated.
+        ticks (int): The number of steps to advance, up to MAX_TICKS.
+        seed (Optional[int]): Seed for the random movement of the NPCs, for reproducible simulations.
+
+    Returns:
+        SimulateNpcsResponse: Reports the outcome of advancing the NPCs of a map, including how many NPCs were written back and where every NPC ended up.
+
+    The NPCs are loaded with a single query and simulated in memory with vectorized movement and collision checks
+    against the grid, in a worker thread so the event loop keeps serving other requests. Every NPC whose position or
+    heading changed is then written back in one batched transaction.
+    """
+    if not 1 <= ticks <= MAX_TICKS:
+        raise ValueError(f"Ticks must be between 1 and {MAX_TICKS}.")
+    storage = project.storage.get_storage()
+    project_map = await storage.maps.find(projectMapId, include_npcs=True)
+    if project_map is None:
+        raise ValueError(f"ProjectMap with ID {projectMapId} does not exist.")
+    npcs = project_map.NPCs or []
+    simulation = await asyncio.to_thread(
+        _run, project.map_cache.get_map_grid(project_map), npcs, ticks, seed
+    )
+    changed = simulation.changed()
+    if changed.size:
+        await storage.npcs.update_batch(
+            {
+                simulation.ids[index]: {"attributes": simulation.attributes_of(index)}
+                for index in changed
+            }
+        )
+    return SimulateNpcsResponse(
+        ticks=ticks,
+        npcCount=len(npcs),
+        updatedCount=int(changed.size),
+        npcs=[
+            NpcPosition(npcId=npc_id, x=int(x), y=int(y))
+            for npc_id, x, y in zip(simulation.ids, simulation.x, simulation.y)
+        ],
+    )
@@ -0,0 +1,319 @@
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "prisma")
+
+
+class UserRecord(BaseModel):
+    """
+    A stored user account.
+    """
+
+    id: str
+    email: str
+    password: str
+    role: str = "PLAYER"
+    createdAt: datetime
+    updatedAt: datetime
+
+
+class ItemRecord(BaseModel):
+    """
+    A stored item placed on a map.
+    """
+
+    id: str
+    projectMapId: str
+    name: str
+    description: Optional[str] = None
+    metaData: Any = None
+
+
+class NpcRecord(BaseModel):
+    """
+    A stored NPC living on a map.
+    """
+
+    id: str
+    projectMapId: str
+    name: str
+    description: Optional[str] = None
+    attributes: Any = None
+
+
+class ProjectMapRecord(BaseModel):
+    """
+    A stored map, with its items and NPCs when they were requested.
+    """
+
+    id: str
+    gameStateId: str
+    name: str
+    description: Optional[str] = None
+    createdAt: datetime
+    updatedAt: datetime
+    cells: Any = None
+    Items: Optional[List[ItemRecord]] = None
+    NPCs: Optional[List[NpcRecord]] = None
+
+
+class GameStateRecord(BaseModel):
+    """
+    A stored save of a game, with its maps when they were requested. Listings leave data unset.
+    """
+
+    id: str
+    userId: str
+    data: Any = None
+    createdAt: datetime
+    updatedAt: datetime
+    Maps: Optional[List[ProjectMapRecord]] = None
+
+
+class JobRecord(BaseModel):
+    """
+    A stored background job: what to run, where it is in its lifecycle and, once finished, its result or error.
+    """
+
+    id: str
+    kind: str
+    status: str = "queued"
+    params: Any = None
+    result: Any = None
+    error: Optional[str] = None
+    createdAt: datetime
+    updatedAt: datetime
+    expiresAt: Optional[datetime] = None
+
+
+class UserRepository(ABC):
+    """
+    Stores user accounts.
+    """
+
+    @abstractmethod
+    async def find(self, id: str) -> Optional[UserRecord]:
+        """Returns the user with the given identifier, or None."""
+
+    @abstractmethod
+    async def find_by_email(self, email: str) -> Optional[UserRecord]:
+        """Returns the user with the given email address, or None."""
+
+    @abstractmethod
+    async def create(self, data: Dict[str, Any]) -> UserRecord:
+        """Creates a user from the given fields and returns it."""
+
+
+class GameStateRepository(ABC):
+    """
+    Stores saved games.
+    """
+
+    @abstractmethod
+    async def find(
+        self, id: str, include_maps: bool = False, include_map_contents: bool = False
+    ) -> Optional[GameStateRecord]:
+        """Returns the save with the given identifier, optionally with its maps and their items and NPCs, or None."""
+
+    @abstractmethod
+    async def find_many(
+        self, ids: List[str], include_maps: bool = False
+    ) -> List[GameStateRecord]:
+        """Returns the saves with the given identifiers that exist, optionally with their maps."""
+
+    @abstractmethod
+    async def create(self, data: Dict[str, Any]) -> GameStateRecord:
+        """Creates a save from the given fields and returns it."""
+
+    @abstractmethod
+    async def list_page(
+        self, userId: str, before: Optional[Tuple[datetime, str]], limit: int
+    ) -> List[GameStateRecord]:
+        """Returns up to limit saves of a user without their data, newest first, ordered after the (updatedAt, id) key before."""
+
+    @abstractmethod
+    async def list_user_ids(self, after: Optional[str], limit: int) -> List[str]:
+        """Returns up to limit distinct identifiers of users with saves, in ascending order after the identifier after."""
+
+    @abstractmethod
+    async def list_retention_candidates(self, userId: str) -> List[Dict[str, Any]]:
+        """Returns every save of a user newest first, as dicts with "id", "updatedAt" (ISO 8601) and "hasMaps"."""
+
+    @abstractmethod
+    async def delete_many(self, ids: List[str]) -> int:
+        """Deletes the saves with the given identifiers and returns how many were deleted."""
+
+
+class MapRepository(ABC):
+    """
+    Stores maps.
+    """
+
+    @abstractmethod
+    async def find(
+        self, id: str, include_items: bool = False, include_npcs: bool = False
+    ) -> Optional[ProjectMapRecord]:
+        """Returns the map with the given identifier, optionally with its items and NPCs, or None."""
+
+    @abstractmethod
+    async def create(self, data: Dict[str, Any]) -> ProjectMapRecord:
+        """Creates a map from the given fields and returns it."""
+
+    @abstractmethod
+    async def update(self, id: str, data: Dict[str, Any]) -> Optional[ProjectMapRecord]:
+        """Updates the given fields of a map and returns it, or None if it does not exist."""
+
+
+class ItemRepository(ABC):
+    """
+    Stores the items of maps.
+    """
+
+    @abstractmethod
+    async def find(self, id: str) -> Optional[ItemRecord]:
+        """Returns the item with the given identifier, or None."""
+
+    @abstractmethod
+    async def create(self, data: Dict[str, Any]) -> ItemRecord:
+        """Creates an item from the given fields and returns it."""
+
+    @abstractmethod
+    async def create_many(self, data: List[Dict[str, Any]]) -> int:
+        """Creates items from the given fields in one operation and returns how many were created."""
+
+    @abstractmethod
+    async def update(self, id: str, data: Dict[str, Any]) -> Optional[ItemRecord]:
+        """Updates the given fields of an item and returns it, or None if it does not exist."""
+
+    @abstractmethod
+    async def delete(self, id: str) -> Optional[ItemRecord]:
+        """Deletes an item and returns it, or None if it does not exist."""
+
+
+class NpcRepository(ABC):
+    """
+    Stores the NPCs of maps.
+    """
+
+    @abstractmethod
+    async def find(self, id: str) -> Optional[NpcRecord]:
+        """Returns the NPC with the given identifier, or None."""
+
+    @abstractmethod
+    async def create(self, data: Dict[str, Any]) -> NpcRecord:
+        """Creates an NPC from the given fields and returns it."""
+
+    @abstractmethod
+    async def update(self, id: str, data: Dict[str, Any]) -> Optional[NpcRecord]:
+        """Updates the given fields of an NPC and returns it, or None if it does not exist."""
+
+    @abstractmethod
+    async def update_batch(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        """Updates many NPCs, mapping NPC identifiers to the fields to update, in one transaction."""
+
+    @abstractmethod
+    async def delete(self, id: str) -> Optional[NpcRecord]:
+        """Deletes an NPC and returns it, or None if it does not exist."""
+
+
+class JobRepository(ABC):
+    """
+    Stores background jobs.
+    """
+
+    @abstractmethod
+    async def find(self, id: str) -> Optional[JobRecord]:
+        """Returns the job with the given identifier, or None."""
+
+    @abstractmethod
+    async def create(self, data: Dict[str, Any]) -> JobRecord:
+        """Creates a job from the given fields and returns it."""
+
+    @abstractmethod
+    async def transition(
+        self, id: str, statuses: List[str], data: Dict[str, Any]
+    ) -> Optional[JobRecord]:
+        """Updates the given fields of a job only if its status is one of statuses, and returns it, or None if it was not updated."""
+
+    @abstractmethod
+    async def list_queued(self, limit: int) -> List[str]:
+        """Returns the identifiers of up to limit queued jobs, oldest first."""
+
+    @abstractmethod
+    async def requeue_stale(self, before: datetime) -> int:
+        """Puts running jobs not updated since before back in the queue and returns how many there were."""
+
+    @abstractmethod
+    async def delete_expired(self, now: datetime) -> int:
+        """Deletes the jobs whose expiresAt has passed and returns how many were deleted."""
+
+
+BULK_TABLES = ["GameState", "ProjectMap", "Item", "NPC"]
+
+
+class BulkRepository(ABC):
+    """
+    Reads and writes whole tables in batches, for exports and imports. Tables are named as in BULK_TABLES.
+    """
+
+    @abstractmethod
+    async def scan(self, table: str, after: Optional[str], limit: int) -> List[Any]:
+        """Returns up to limit records of a table ordered by identifier, starting after the identifier after."""
+
+    @abstractmethod
+    async def insert_many(self, table: str, rows: List[Dict[str, Any]]) -> int:
+        """Creates records of a table in one transaction, all or none of them, and returns how many were created."""
+
+
+class Storage(ABC):
+    """
+    A storage backend, giving access to the repository of every kind of record.
+    """
+
+    users: UserRepository
+    game_states: GameStateRepository
+    maps: MapRepository
+    items: ItemRepository
+    npcs: NpcRepository
+    jobs: JobRepository
+    bulk: BulkRepository
+
+    @abstractmethod
+    async def connect(self) -> None:
+        """Opens the backend before the first request."""
+
+    @abstractmethod
+    async def disconnect(self) -> None:
+        """Closes the backend after the last request."""
+
+
+_storage: Optional[Storage] = None
+
+
+def get_storage() -> Storage:
+    """
+    Returns the storage backend of this process, creating it on first use.
+
+    STORAGE_BACKEND selects the backend: "prisma" (the default) stores records in Postgres through the Prisma
+    client, and "memory" keeps them in dicts inside the process, optionally snapshotted to disk.
+
+    Returns:
+        Storage: The storage backend.
+    """
+    global _storage
+    if _storage is None:
+        if STORAGE_BACKEND == "prisma":
+            import project.prisma_storage
+
+            _storage = project.prisma_storage.PrismaStorage()
+        elif STORAGE_BACKEND == "memory":
+            import project.memory_storage
+
+            _storage = project.memory_storage.MemoryStorage()
+        else:
+            raise ValueError(f"Unknown storage backend '{STORAGE_BACKEND}'.")
+    return _storage
@@ -1,7 +1,6 @@
 from typing import Any, Dict, Optional
 
-import prisma
-import prisma.models
+import project.storage
 from pydantic import BaseModel
 
 
@@ -40,12 +39,12 @@ async def update_item(
     Returns:
     ItemUpdateResponse: Confirms the successful update of an item, returning the updated attributes for verification by the client.
     """
-    item_to_update = await prisma.models.Item.prisma().find_unique(where={"id": itemId})
+    storage = project.storage.get_storage()
+    item_to_update = await storage.items.find(itemId)
     if item_to_update is None:
         return ItemUpdateResponse(success=False, updatedItem=None)
-    updated_item = await prisma.models.Item.prisma().update(
-        where={"id": itemId},
-        data={"name": name, "description": description, "metaData": metaData},
+    updated_item = await storage.items.update(
+        itemId, {"name": name, "description": description, "metaData": metaData}
     )
     updated_item_type = UpdatedItemType(
         itemId=updated_item.id,
@@ -0,0 +1,71 @@
+from typing import List
+
+import numpy as np
+import project.fetch_map_region_service
+import project.grid_store
+import project.map_cache
+import project.map_grid
+import project.storage
+from pydantic import BaseModel
+
+
+class MapRegionUpdateResponse(BaseModel):
+    """
+    Confirms an edit of a rectangular region of a map's cell grid, giving the region that was written.
+    """
+
+    projectMapId: str
+    x: int
+    y: int
+    width: int
+    height: int
+
+
+async def update_map_region(
+    projectMapId: str, x: int, y: int, cells: List[List[int]]
+) -> MapRegionUpdateResponse:
+    """
+    Overwrites the cell types of a rectangular region of a map.
+
+    Args:
+        projectMapId (str): The unique identifier of the map to edit.
+        x (int): The column of the top-left cell of the region.
+        y (int): The row of the top-left cell of the region.
+        cells (List[List[int]]): The new cell types of the region, as a rectangular list of rows that must lie within the map.
+
+    Returns:
+        MapRegionUpdateResponse: Confirms an edit of a rectangular region of a map's cell grid, giving the region that was written.
+
+    Maps kept in the grid store are written in place in their memory-mapped grid file, touching only the rows of the
+    region, and synced to disk every GRID_STORE_FSYNC_INTERVAL seconds. Other maps have their cells column rewritten.
+    Either way the map's cache version changes, so cached grids, labels and renders of the old cells are not served
+    again.
+    """
+    block = project.map_grid.decode_cells(cells)
+    if (
+        block.size == 0
+        or block.size > project.fetch_map_region_service.MAX_REGION_CELLS
+    ):
+        raise ValueError(
+            f"Region must be non-empty and cover at most {project.fetch_map_region_service.MAX_REGION_CELLS} cells."
+        )
+    if block.max() >= project.map_grid.CELL_TYPE_COUNT:
+        raise ValueError(
+            f"Cell types must be between 0 and {project.map_grid.CELL_TYPE_COUNT - 1}."
+        )
+    storage = project.storage.get_storage()
+    project_map = await storage.maps.find(projectMapId)
+    if project_map is None:
+        raise ValueError("Map not found for the provided ID.")
+    height, width = block.shape
+    if project.grid_store.is_stored(project_map.cells):
+        project.grid_store.write_region(projectMapId, x, y, block)
+    else:
+        grid = np.array(project.map_cache.get_map_grid(project_map))
+        if x < 0 or y < 0 or y + height > grid.shape[0] or x + width > grid.shape[1]:
+            raise ValueError("Region lies outside of the map.")
+        grid[y : y + height, x : x + width] = block
+        await storage.maps.update(projectMapId, {"cells": grid.tolist()})
+    return MapRegionUpdateResponse(
+        projectMapId=projectMapId, x=x, y=y, width=width, height=height
+    )
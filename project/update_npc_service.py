@@ -1,7 +1,6 @@
 from typing import Any, Dict, Optional
 
-import prisma
-import prisma.models
+import project.storage
 from pydantic import BaseModel
 
 
@@ -43,7 +42,8 @@ async def update_npc(
     Returns:
         UpdateNpcResponse: Response structure confirming the NPC's updated status.
     """
-    npc = await prisma.models.NPC.prisma().find_unique(where={"id": npcId})
+    storage = project.storage.get_storage()
+    npc = await storage.npcs.find(npcId)
     if npc is None:
         return UpdateNpcResponse(
             success=False, npc=NPC(id="", name="", description="", attributes={})
@@ -55,9 +55,7 @@ async def update_npc(
         update_data["description"] = description
     if attributes:
         update_data["attributes"] = attributes
-    updated_npc = await prisma.models.NPC.prisma().update(
-        where={"id": npcId}, data=update_data
-    )
+    updated_npc = await storage.npcs.update(npcId, update_data)
     npc_updated = NPC(
         id=updated_npc.id,
         name=updated_npc.name,
@@ -0,0 +1,156 @@
+import json
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import project.map_grid
+from pydantic import BaseModel
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+GRID_MEDIA_TYPE = "application/octet-stream"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+GRID_MAGIC = b"MZGW"
+GRID_VERSION = 1
+GRID_HEADER = struct.Struct("<4sHHIII")
+
+GRID_MEDIA_TYPES = [JSON_MEDIA_TYPE, GRID_MEDIA_TYPE] + (
+    [MSGPACK_MEDIA_TYPE, "application/x-msgpack"] if msgpack is not None else []
+)
+
+
+def _parse_accept(accept: str) -> List[Tuple[str, float]]:
+    ranges = []
+    for part in accept.split(","):
+        media_range, *params = [value.strip() for value in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_range:
+            ranges.append((media_range.lower(), quality))
+    return ranges
+
+
+def _quality(media_type: str, ranges: List[Tuple[str, float]]) -> float:
+    kind = media_type.split("/")[0]
+    for candidate in (media_type, f"{kind}/*", "*/*"):
+        qualities = [
+            quality for media_range, quality in ranges if media_range == candidate
+        ]
+        if qualities:
+            return max(qualities)
+    return 0.0
+
+
+def negotiate(accept: Optional[str], offered: List[str]) -> str:
+    """
+    Picks the media type to respond with from the Accept header of a request.
+
+    Args:
+        accept (Optional[str]): The Accept header, or None when the request has none.
+        offered (List[str]): The media types the route can produce, the default first.
+
+    Returns:
+        str: The offered media type the header prefers, the most specific matching media range deciding its quality; ties and unacceptable requests go to the default.
+    """
+    if not accept:
+        return offered[0]
+    ranges = _parse_accept(accept)
+    best, best_quality = offered[0], 0.0
+    for media_type in offered:
+        quality = _quality(media_type, ranges)
+        if quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+
+def encode_grid(grid: np.ndarray, metadata: Dict[str, Any]) -> bytes:
+    """
+    Encodes a grid of cell types in the compact binary wire format.
+
+    The format is a 20-byte little-endian header (the magic "MZGW", a uint16 version, a uint16 reserved for flags,
+    then the uint32 height, width and length of the metadata), the metadata as UTF-8 JSON, and finally the cells
+    as height * width uint8 values, row by row.
+
+    Args:
+        grid (np.ndarray): The (height, width) array of cell types.
+        metadata (Dict[str, Any]): The other fields of the response, sent alongside the cells.
+
+    Returns:
+        bytes: The encoded grid.
+    """
+    meta = json.dumps(metadata, separators=(",", ":")).encode("utf-8")
+    height, width = grid.shape
+    return b"".join(
+        [
+            GRID_HEADER.pack(GRID_MAGIC, GRID_VERSION, 0, height, width, len(meta)),
+            meta,
+            np.ascontiguousarray(grid, dtype=np.uint8).tobytes(),
+        ]
+    )
+
+
+def decode_grid(data: bytes) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    Decodes a grid encoded with encode_grid.
+
+    Args:
+        data (bytes): The encoded grid.
+
+    Returns:
+        Tuple[np.ndarray, Dict[str, Any]]: The (height, width) array of cell types and the metadata sent with it.
+    """
+    if len(data) < GRID_HEADER.size:
+        raise ValueError("Grid data is truncated.")
+    magic, version, _, height, width, meta_length = GRID_HEADER.unpack_from(data)
+    if magic != GRID_MAGIC or version != GRID_VERSION:
+        raise ValueError("Data is not an encoded grid.")
+    cells_offset = GRID_HEADER.size + meta_length
+    if len(data) != cells_offset + height * width:
+        raise ValueError("Grid data does not match the size in its header.")
+    metadata = json.loads(bytes(data[GRID_HEADER.size : cells_offset]))
+    grid = np.frombuffer(data, dtype=np.uint8, offset=cells_offset)
+    return grid.reshape(height, width), metadata
+
+
+def encode_grid_response(
+    response: BaseModel, grid_field: str, media_type: str
+) -> bytes:
+    """
+    Encodes a response model whose grid_field holds map cells in a binary media type.
+
+    For application/octet-stream the cells are sent with encode_grid and every other field as its metadata. For
+    msgpack the response is packed as a map in which grid_field holds the "height", "width" and raw "cells" bytes.
+
+    Args:
+        response (BaseModel): The response model to encode.
+        grid_field (str): The name of the field holding the cells as a list of rows.
+        media_type (str): The negotiated media type, one of GRID_MEDIA_TYPES other than JSON.
+
+    Returns:
+        bytes: The encoded response.
+    """
+    grid = project.map_grid.decode_cells(getattr(response, grid_field))
+    metadata = response.model_dump(mode="json", exclude={grid_field})
+    if media_type == GRID_MEDIA_TYPE:
+        return encode_grid(grid, metadata)
+    return msgpack.packb(
+        {
+            **metadata,
+            grid_field: {
+                "height": grid.shape[0],
+                "width": grid.shape[1],
+                "cells": np.ascontiguousarray(grid).tobytes(),
+            },
+        }
+    )
@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+import numpy as np
+import project.bulk_transfer
+import project.grid_store
+import project.memory_storage
+import project.storage
+import pytest
+
+CELLS = [[2, 2, 2, 2], [2, 4, 1, 2], [2, 1, 5, 2], [2, 2, 2, 2]]
+
+
+@pytest.fixture
+def use_storage(monkeypatch):
+    def use_storage():
+        storage = project.memory_storage.MemoryStorage()
+        monkeypatch.setattr(project.storage, "_storage", storage)
+        return storage
+
+    return use_storage
+
+
+async def _export(tables):
+    stream = await project.bulk_transfer.export_records(tables)
+    return b"".join([chunk async for chunk in stream])
+
+
+async def _import(data):
+    async def chunks():
+        yield data
+
+    return await project.bulk_transfer.import_records(chunks())
+
+
+async def _create_user(storage):
+    await storage.users.create({"id": "u1", "email": "a@b.c", "password": "x"})
+
+
+@pytest.mark.parametrize(
+    "map_state",
+    [CELLS, {"cells": CELLS, "items": [{"x": 1, "y": 2}]}],
+    ids=["rows", "cells-object"],
+)
+def test_game_state_map_state_round_trip(use_storage, map_state):
+    data = {"mapState": map_state, "playerPosition": {"x": 1, "y": 1}}
+
+    async def run():
+        source = use_storage()
+        await _create_user(source)
+        game_state = await source.game_states.create({"userId": "u1", "data": data})
+        export = await _export(["GameState"])
+        target = use_storage()
+        await _create_user(target)
+        summary = await _import(export)
+        return export, summary, await target.game_states.find(game_state.id)
+
+    export, summary, imported = asyncio.run(run())
+
+    exported = json.loads(export.splitlines()[1])["row"]["data"]["mapState"]
+    grid = exported["cells"] if isinstance(map_state, dict) else exported
+    assert set(grid) == {"$grid"}
+    assert summary.rows == {"GameState": 1}
+    assert imported.data == data
+
+
+async def _export_map(source, cells):
+    await _create_user(source)
+    game_state = await source.game_states.create({"userId": "u1", "data": {}})
+    project_map = await source.maps.create(
+        {"gameStateId": game_state.id, "name": "Map", "cells": cells}
+    )
+    return game_state, project_map, await _export(["ProjectMap"])
+
+
+@pytest.fixture
+def grid_store_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(project.grid_store, "GRID_STORE_BACKEND", "mmap")
+    monkeypatch.setattr(project.grid_store, "GRID_STORE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_failed_map_batch_removes_its_grid_files(use_storage, grid_store_dir):
+    async def run():
+        _, _, export = await _export_map(use_storage(), CELLS)
+        use_storage()
+        with pytest.raises(ValueError):
+            await _import(export)
+
+    asyncio.run(run())
+
+    assert list(grid_store_dir.iterdir()) == []
+
+
+def test_duplicate_map_import_keeps_existing_grid(use_storage, grid_store_dir):
+    async def run():
+        game_state, project_map, export = await _export_map(use_storage(), CELLS)
+        target = use_storage()
+        await _create_user(target)
+        await target.game_states.create(
+            {"id": game_state.id, "userId": "u1", "data": {}}
+        )
+        await _import(export)
+        project.grid_store.write_region(project_map.id, 1, 1, np.array([[3]]))
+        with pytest.raises(FileExistsError):
+            await _import(export)
+        return project_map
+
+    project_map = asyncio.run(run())
+
+    grid = project.grid_store.open_grid(project_map.id)
+    assert grid[1, 1] == 3 and grid[2, 2] == 5
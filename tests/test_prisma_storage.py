@@ -0,0 +1,89 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+prisma_models = pytest.importorskip("prisma.models")
+
+import project.prisma_storage  # noqa: E402
+
+
+class RecordingActions:
+    def __init__(self):
+        self.calls = []
+
+    def _row(self):
+        now = datetime.now(timezone.utc)
+        return {
+            "id": "row-1",
+            "kind": "render",
+            "gameStateId": "gs-1",
+            "name": "Map",
+            "createdAt": now,
+            "updatedAt": now,
+        }
+
+    async def create(self, data):
+        self.calls.append(("create", data))
+        return self._row()
+
+    async def update(self, where, data):
+        self.calls.append(("update", data))
+        return self._row()
+
+    async def update_many(self, where, data):
+        self.calls.append(("update_many", data))
+        return 1
+
+    async def find_unique(self, where):
+        return self._row()
+
+
+@pytest.fixture
+def actions(monkeypatch):
+    actions = RecordingActions()
+    for model in ("Job", "ProjectMap"):
+        monkeypatch.setattr(getattr(prisma_models, model), "prisma", lambda: actions)
+    return actions
+
+
+def test_job_json_columns_are_sent_as_json_text(actions):
+    jobs = project.prisma_storage.PrismaJobRepository()
+    params = {"projectMapId": "map-1", "scale": 4}
+    result = {"png": "abc", "size": [64, 64]}
+
+    asyncio.run(jobs.create({"kind": "render", "params": params}))
+    asyncio.run(
+        jobs.transition("job-1", ["running"], {"status": "done", "result": result})
+    )
+
+    assert actions.calls == [
+        ("create", {"kind": "render", "params": json.dumps(params)}),
+        ("update_many", {"status": "done", "result": json.dumps(result)}),
+    ]
+
+
+def test_json_columns_already_serialized_or_null_are_passed_through(actions):
+    jobs = project.prisma_storage.PrismaJobRepository()
+
+    asyncio.run(jobs.create({"kind": "render", "params": '{"scale": 4}'}))
+    asyncio.run(jobs.transition("job-1", ["running"], {"result": None}))
+
+    assert actions.calls == [
+        ("create", {"kind": "render", "params": '{"scale": 4}'}),
+        ("update_many", {"result": None}),
+    ]
+
+
+def test_map_cells_are_sent_as_json_text(actions):
+    maps = project.prisma_storage.PrismaMapRepository()
+    cells = [[0, 1], [2, 3]]
+
+    asyncio.run(maps.create({"gameStateId": "gs-1", "cells": cells}))
+    asyncio.run(maps.update("map-1", {"cells": cells}))
+
+    assert actions.calls == [
+        ("create", {"gameStateId": "gs-1", "cells": json.dumps(cells)}),
+        ("update", {"cells": json.dumps(cells)}),
+    ]